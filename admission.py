@@ -0,0 +1,387 @@
+import os
+import math
+import asyncio
+import time
+import logging
+import threading
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, List, Optional
+
+from cache import LRUCache
+
+logger = logging.getLogger("admission")
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1").lower() in ("1", "true", "yes")
+# token buckets: requests/second refill and burst size (rate <= 0 disables the bucket)
+ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "20"))
+ADMISSION_GLOBAL_BURST = float(os.getenv("ADMISSION_GLOBAL_BURST", "40"))
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "2"))
+ADMISSION_CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "10"))
+# header naming the client (e.g. X-API-Key, or X-Forwarded-For behind a trusted proxy); default: remote address
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "")
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))  # client buckets kept (LRU)
+# in-flight calls per upstream; further requests wait in a short bounded queue, then get a 429
+ADMISSION_INFLIGHT_PAAPI = int(os.getenv("ADMISSION_INFLIGHT_PAAPI", "8"))
+ADMISSION_INFLIGHT_AZURE_OPENAI = int(os.getenv("ADMISSION_INFLIGHT_AZURE_OPENAI", "16"))
+ADMISSION_INFLIGHT_X = int(os.getenv("ADMISSION_INFLIGHT_X", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))  # waiters per upstream
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))  # seconds a request may wait for a slot
+ASYNC_POLL_INTERVAL = 0.01  # seconds between slot checks of a waiting coroutine
+
+
+# set by gated(): upstream calls outside a gated context (CLI, batch, job workers) are not limited
+_GATED: contextvars.ContextVar = contextvars.ContextVar("admission_gated", default=False)
+
+
+@contextmanager
+def gated() -> Iterator[None]:
+    """
+    Turns the in-flight gates on for the upstream calls made in this context
+    (the current thread or asyncio task). Interactive routes wrap their work in
+    it, so a busy upstream gives them a fast 429; anything else waits on the
+    upstream's own limits instead of failing.
+    """
+    token = _GATED.set(True)
+    try:
+        yield
+    finally:
+        _GATED.reset(token)
+
+
+class Rejected(RuntimeError):
+    """
+    Raised when a request is not admitted; retry_after is in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+# =========================================================
+# Token bucket
+# =========================================================
+class TokenBucket:
+    """
+    `rate` tokens per second up to `burst`. take() either spends the tokens or
+    returns how long until they would be available (nothing is spent then).
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, cost: float = 1.0) -> float:
+        cost = min(cost, self.burst)  # a request larger than the burst could otherwise never pass
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0.0
+            return (cost - self._tokens) / self.rate
+
+    def refund(self, cost: float = 1.0):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + cost)
+
+
+# =========================================================
+# In-flight limit
+# =========================================================
+class InflightGate:
+    """
+    At most `limit` holders at a time. Up to `max_queue` callers may wait up to
+    `timeout` seconds for a slot; beyond that acquire() fails immediately, so
+    a burst gets fast 429s instead of piling up on blocked threads.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int = ADMISSION_MAX_QUEUE,
+                 timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return True
+            if self.waiting >= self.max_queue or self.timeout <= 0:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.timeout
+                while self.in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.in_flight += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self) -> bool:
+        """
+        acquire() for coroutines: waits by polling instead of blocking the event
+        loop, and shares the count with threaded callers of the same process.
+        """
+        with self._cond:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return True
+            if self.waiting >= self.max_queue or self.timeout <= 0:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+        try:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+                with self._cond:
+                    if self.in_flight < self.limit:
+                        self.in_flight += 1
+                        return True
+                    if time.monotonic() >= deadline:
+                        self.rejected += 1
+                        return False
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting, "rejected": self.rejected}
+
+
+# =========================================================
+# Controller
+# =========================================================
+class AdmissionController:
+    """
+    Per-process admission control for the routes that call PA-API, Azure
+    OpenAI or X:
+
+    - a global token bucket and one token bucket per client (IP or API key),
+      checked once per request by the route,
+    - a bounded in-flight limit per upstream with a short bounded wait queue,
+      held only around the call to that upstream, and only inside gated().
+
+        ADMISSION.check(client)                  # raises Rejected -> 429 with Retry-After
+        with gated():
+            ...                                  # PA-API / Azure OpenAI calls hold their slot
+
+    Limits are per worker process, like the metrics.
+    """
+
+    def __init__(self, global_rate: float = ADMISSION_GLOBAL_RATE, global_burst: float = ADMISSION_GLOBAL_BURST,
+                 client_rate: float = ADMISSION_CLIENT_RATE, client_burst: float = ADMISSION_CLIENT_BURST,
+                 inflight: Optional[Dict[str, int]] = None, max_clients: int = ADMISSION_MAX_CLIENTS):
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self._clients = LRUCache(max_entries=max_clients)
+        self._clients_lock = threading.Lock()
+        if inflight is None:
+            inflight = {
+                "paapi": ADMISSION_INFLIGHT_PAAPI,
+                "azure_openai": ADMISSION_INFLIGHT_AZURE_OPENAI,
+                "x": ADMISSION_INFLIGHT_X,
+            }
+        self.gates = {name: InflightGate(name, limit) for name, limit in inflight.items() if limit > 0}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def _client_bucket(self, client: str) -> Optional[TokenBucket]:
+        if self.client_rate <= 0:
+            return None
+        bucket = self._clients.get(client)
+        if bucket is None:
+            with self._clients_lock:
+                bucket = self._clients.get(client)
+                if bucket is None:
+                    bucket = TokenBucket(self.client_rate, self.client_burst)
+                    self._clients.set(client, bucket)
+        return bucket
+
+    def check(self, client: str, cost: float = 1.0):
+        """
+        Spends `cost` tokens from the client's and the global bucket, or raises
+        Rejected with the time until they refill.
+        """
+        bucket = self._client_bucket(client)
+        if bucket is not None:
+            wait = bucket.take(cost)
+            if wait > 0:
+                self._count("client_rate")
+                raise Rejected("Too many requests from this client", wait, "client_rate")
+
+        if self.global_bucket is not None:
+            wait = self.global_bucket.take(cost)
+            if wait > 0:
+                if bucket is not None:
+                    bucket.refund(cost)  # not the client's fault
+                self._count("global_rate")
+                raise Rejected("Server is busy, try again shortly", wait, "global_rate")
+
+    @contextmanager
+    def hold(self, upstreams: Iterable[str] = ()) -> Iterator[None]:
+        """
+        Holds one in-flight slot per upstream for the duration of the block;
+        raises Rejected when a slot is not free within the queue timeout.
+        Does nothing outside gated().
+        """
+        if not _GATED.get():
+            yield
+            return
+        acquired: List[InflightGate] = []
+        try:
+            for name in upstreams:
+                gate = self.gates.get(name)
+                if gate is None:
+                    continue
+                if not gate.acquire():
+                    self._count(f"{name}_busy")
+                    raise Rejected(f"Too many requests in flight to {name}", gate.timeout or 1, f"{name}_busy")
+                acquired.append(gate)
+            self._count("admitted")
+            yield
+        finally:
+            for gate in reversed(acquired):
+                gate.release()
+
+    @asynccontextmanager
+    async def hold_async(self, upstreams: Iterable[str] = ()) -> AsyncIterator[None]:
+        """
+        hold() for coroutines; the slots are shared with threaded callers.
+        """
+        if not _GATED.get():
+            yield
+            return
+        acquired: List[InflightGate] = []
+        try:
+            for name in upstreams:
+                gate = self.gates.get(name)
+                if gate is None:
+                    continue
+                if not await gate.acquire_async():
+                    self._count(f"{name}_busy")
+                    raise Rejected(f"Too many requests in flight to {name}", gate.timeout or 1, f"{name}_busy")
+                acquired.append(gate)
+            self._count("admitted")
+            yield
+        finally:
+            for gate in reversed(acquired):
+                gate.release()
+
+    @contextmanager
+    def admit(self, client: str, upstreams: Iterable[str] = (), cost: float = 1.0) -> Iterator[None]:
+        self.check(client, cost)
+        with gated(), self.hold(upstreams):
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "counts": counts,
+            "clients": len(self._clients),
+            "upstreams": {name: gate.stats() for name, gate in self.gates.items()},
+        }
+
+    def metric_lines(self) -> List[str]:
+        stats = self.stats()
+        lines = [
+            "# HELP azp_admission_requests_total Admission decisions by outcome (admitted or rejection reason).",
+            "# TYPE azp_admission_requests_total counter",
+        ]
+        for outcome, n in sorted(stats["counts"].items()):
+            lines.append(f'azp_admission_requests_total{{outcome="{outcome}"}} {n}')
+        lines += [
+            "# HELP azp_admission_in_flight Requests holding an upstream slot.",
+            "# TYPE azp_admission_in_flight gauge",
+        ]
+        for name, gate in sorted(stats["upstreams"].items()):
+            lines.append(f'azp_admission_in_flight{{upstream="{name}"}} {gate["in_flight"]}')
+        return lines
+
+
+class _Disabled:
+    """
+    Stand-in used when ADMISSION_ENABLED is off: admits everything.
+    """
+
+    def check(self, client: str, cost: float = 1.0):
+        return None
+
+    @contextmanager
+    def hold(self, upstreams: Iterable[str] = ()) -> Iterator[None]:
+        yield
+
+    @asynccontextmanager
+    async def hold_async(self, upstreams: Iterable[str] = ()) -> AsyncIterator[None]:
+        yield
+
+    @contextmanager
+    def admit(self, client: str, upstreams: Iterable[str] = (), cost: float = 1.0) -> Iterator[None]:
+        yield
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+    def metric_lines(self) -> List[str]:
+        return []
+
+
+def create_admission_controller():
+    """
+    AdmissionController configured from the ADMISSION_* settings, or a no-op
+    stand-in when ADMISSION_ENABLED is off.
+    """
+    if not ADMISSION_ENABLED:
+        return _Disabled()
+    return AdmissionController()
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """
+    Process-wide controller shared by the routes (client buckets) and the
+    upstream call sites (in-flight gates).
+    """
+    global _admission
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                _admission = create_admission_controller()
+    return _admission
@@ -1,34 +1,155 @@
 import os
+import io
 import json
 import base64
 import time
 import secrets
 import hashlib
-import requests
-from flask import Flask, redirect, request, render_template, flash, session
+import logging
+from flask import Flask, redirect, request, render_template, flash, session, Response, stream_with_context
 from dotenv import load_dotenv
 from urllib.parse import urlencode
 from flask import jsonify
-from get_description import generate_post_text_for_asin
+import http_client
+from jobs import JobQueue, QueueFullError
+from post_queue import NotSent, PostQueue
+from token_store import create_token_store, migrate_json, UsersView
+from cache import SqliteCache, get_item_cache, get_generation_cache
+from token_refresh import TOKEN_REFRESH_TIMEOUT, TokenRefreshManager
+from post_history import get_post_history
+from admission import ADMISSION_CLIENT_HEADER, Rejected, gated, get_admission_controller
+import metrics
 
 
 load_dotenv()
+# INFO logs from the post queue, token refresh and (once loaded) generation modules
+logging.basicConfig(level=logging.INFO)
 
 CLIENT_ID = os.getenv("X_CLIENT_ID")
 CLIENT_SECRET = os.getenv("X_CLIENT_SECRET")
 CALLBACK_URL = os.getenv("CALLBACK_URL")
 SCOPES = ["tweet.read", "tweet.write", "users.read", "offline.access"]
 
-TOKEN_FILE = "users.json"  # Lokal token dosyası
+TOKEN_FILE = "users.json"  # Eski lokal token dosyası (token store'a taşınır)
+
+X_API_BASE_URL = os.getenv("X_API_BASE_URL", "https://api.twitter.com").rstrip("/")  # override for local mocks
 
 AUTH_URL = "https://twitter.com/i/oauth2/authorize"
-TOKEN_URL = "https://api.twitter.com/2/oauth2/token"
-ME_URL = "https://api.twitter.com/2/users/me"
-TWEET_URL = "https://api.twitter.com/2/tweets"
+TOKEN_URL = f"{X_API_BASE_URL}/2/oauth2/token"
+ME_URL = f"{X_API_BASE_URL}/2/users/me"
+TWEET_URL = f"{X_API_BASE_URL}/2/tweets"
+
+# production: several worker processes (see wsgi.py); shared state lives in SQLite
+APP_MODE = os.getenv("APP_MODE", "development")
+STATE_DB = os.getenv("STATE_DB", "state.db")
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET", "dev-secret-change-me")
 
+if os.getenv("LOG_TRACE_IDS", "0").lower() in ("1", "true", "yes"):
+    metrics.install_trace_logging()
+
+# ---------------- METRICS ----------------
+@app.before_request
+def _start_request():
+    request.environ["azp.start"] = time.perf_counter()
+    metrics.new_trace_id(request.headers.get("X-Request-ID"))
+
+@app.after_request
+def _finish_request(resp):
+    start = request.environ.get("azp.start")
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        metrics.ROUTE_SECONDS.observe(
+            time.perf_counter() - start, route=route, method=request.method, status=resp.status_code
+        )
+    resp.headers["X-Request-ID"] = metrics.current_trace_id()
+    return resp
+
+def _cache_metrics():
+    lines = [
+        "# HELP azp_cache_lookups_total Cache lookups by cache and result.",
+        "# TYPE azp_cache_lookups_total counter",
+    ]
+    item_cache, gen_cache = get_item_cache(), get_generation_cache()
+    if item_cache is not None:
+        stats = item_cache.stats()
+        for result in ("memory_hits", "disk_hits", "misses"):
+            lines.append(f'azp_cache_lookups_total{{cache="item",result="{result}"}} {stats[result]}')
+    if gen_cache is not None:
+        stats = gen_cache.stats()
+        for result in ("hits", "misses", "bypassed"):
+            lines.append(f'azp_cache_lookups_total{{cache="generation",result="{result}"}} {stats[result]}')
+    return lines
+
+metrics.REGISTRY.add_collector(_cache_metrics)
+
+# ---------------- ADMISSION CONTROL ----------------
+# token buckets (global + per client) checked here; the in-flight limits per upstream are
+# taken around each PA-API / Azure OpenAI call in get_description, for the interactive
+# routes only (admission.gated), so batch and job work waits instead of failing
+ADMISSION = get_admission_controller()
+metrics.REGISTRY.add_collector(ADMISSION.metric_lines)
+
+def _client_key():
+    if ADMISSION_CLIENT_HEADER:
+        value = request.headers.get(ADMISSION_CLIENT_HEADER, "")
+        if value:
+            return value.split(",")[0].strip()
+    return request.remote_addr or "unknown"
+
+def _rejected(e: Rejected):
+    resp = jsonify({"ok": False, "error": str(e), "reason": e.reason})
+    resp.status_code = 429
+    resp.headers["Retry-After"] = e.retry_after_header
+    return resp
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Prometheus text exposition (per worker process; scrape each worker or
+    aggregate upstream).
+    """
+    return Response(metrics.REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def history_answer(data, asin, n):
+    """
+    The /generate_tweet answer the posting history gives without calling any
+    upstream, as (body, status), or None. Shared with the ASGI route.
+
+    "account": refuse an ASIN already posted there (409) unless "repost": true,
+    and reuse a text generated earlier but not posted there. Without an account
+    an unposted text is only served on "reuse": true, so plain calls
+    (regenerate, GEN_CACHE_VARIANTS rotation) keep getting new texts.
+    """
+    history = get_post_history()
+    if history is None:
+        return None
+    account = data.get("account") or None
+    if account and not data.get("repost"):
+        posted = history.last_posted(account, asin)
+        if posted:
+            metrics.POST_HISTORY_HITS.inc(kind="already_posted")
+            return {
+                "ok": False,
+                "error": f"ASIN {asin} was already posted on this account",
+                "post_text": posted["text"],
+                "posted_at": posted["posted_at"],
+            }, 409
+    if not data.get("fresh") and (account or data.get("reuse")) and n == 1:
+        previous = history.unposted_text(asin, account)
+        if previous:
+            metrics.POST_HISTORY_HITS.inc(kind="unposted_text")
+            return {"ok": True, "post_text": previous, "from_history": True}, 200
+    return None
+
+def record_generated(asin, texts):
+    history = get_post_history()
+    if history is not None:
+        from get_description import FALLBACK_TWEET_CONTENT
+        # the fallback text is not worth serving again
+        history.record_generated(asin, [t for t in texts if FALLBACK_TWEET_CONTENT["description"] not in t])
+
 @app.route("/generate_tweet", methods=["POST"])
 def generate_tweet():
     data = request.get_json(silent=True) or {}
@@ -36,22 +157,204 @@ def generate_tweet():
     if not asin:
         return jsonify({"ok": False, "error": "ASIN is required"}), 400
 
+    # "fresh": true bypasses the generation cache (GEN_CACHE_ENABLED) and the posting history
+    use_cache = not bool(data.get("fresh"))
+
+    # imported on first use so processes that only post never load the LLM stack
+    from get_description import (
+        generate_post_text_for_asin,
+        generate_post_text_variants_for_asin,
+        variant_count,
+    )
+
+    try:
+        ADMISSION.check(_client_key())
+    except Rejected as e:
+        return _rejected(e)
+
     try:
-        post_text = generate_post_text_for_asin(asin)
-        return jsonify({"ok": True, "post_text": post_text})
+        # "variants": N returns up to N alternatives from one model call
+        n = variant_count(data.get("variants"))
+        answered = history_answer(data, asin, n)
+        if answered is not None:
+            body, status = answered
+            return jsonify(body), status
+
+        with gated():
+            if n > 1:
+                texts = variants = generate_post_text_variants_for_asin(asin, n=n)
+                body = {"ok": True, "post_text": variants[0], "variants": variants}
+            else:
+                post_text = generate_post_text_for_asin(asin, use_cache=use_cache)
+                texts, body = [post_text], {"ok": True, "post_text": post_text}
+
+        record_generated(asin, texts)
+        return jsonify(body)
+    except Rejected as e:
+        return _rejected(e)
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
 
-# ------------------ USERS ------------------
-if os.path.exists(TOKEN_FILE):
-    with open(TOKEN_FILE, "r", encoding="utf-8") as f:
-        USERS = json.load(f)
-else:
-    USERS = {}
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route("/generate_tweet/stream", methods=["GET"])
+def generate_tweet_stream():
+    """
+    Server-Sent Events variant of /generate_tweet (?asin=...&fresh=1, and
+    account / repost=1 / reuse=1 as in its JSON body).
+    Events: item (title/url), delta (description tokens), done (post_text), error.
+    A text served from the posting history comes as a single done event with
+    "from_history": true; an ASIN already posted on the account as an error
+    event with status 409.
+    """
+    asin = (request.args.get("asin") or "").strip()
+    if not asin:
+        return jsonify({"ok": False, "error": "ASIN is required"}), 400
+
+    flags = {name: request.args.get(name) in ("1", "true") for name in ("fresh", "repost", "reuse")}
+    use_cache = not flags["fresh"]
+    data = dict(flags, account=request.args.get("account") or None)
+
+    try:
+        ADMISSION.check(_client_key())
+    except Rejected as e:
+        return _rejected(e)
+
+    from get_description import stream_post_text_for_asin
+
+    def events():
+        # upstream slots are taken around each call inside the stream (see get_description)
+        try:
+            answered = history_answer(data, asin, 1)
+            if answered is not None:
+                body, status = answered
+                if status == 200:
+                    yield _sse("done", {"post_text": body["post_text"], "from_history": True})
+                else:
+                    yield _sse("error", dict(body, status=status))
+                return
+            with gated():
+                for event, payload in stream_post_text_for_asin(asin, use_cache=use_cache):
+                    yield _sse(event, payload)
+                    if event == "done":
+                        record_generated(asin, [payload["post_text"]])
+        except Rejected as e:
+            yield _sse("error", {"error": str(e), "retry_after": e.retry_after_header})
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ---------------- GENERATION JOBS ----------------
+GEN_JOBS = JobQueue(
+    max_workers=int(os.getenv("GEN_JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("GEN_JOB_MAX_PENDING", "100")),
+    # a poll may land on a different worker than the one running the job
+    shared=SqliteCache(STATE_DB, table="gen_jobs", ttl=300) if APP_MODE == "production" else None,
+)
+GEN_JOB_MAX_WAIT = 25  # seconds a poll may block (long poll)
+
+@app.route("/generate_tweet/jobs", methods=["POST"])
+def create_generate_job():
+    """
+    Non-blocking variant of /generate_tweet: returns a job id right away.
+    Requests for an ASIN that is already being generated share one job.
+    """
+    data = request.get_json(silent=True) or {}
+    asin = (data.get("asin") or "").strip()
+    if not asin:
+        return jsonify({"ok": False, "error": "ASIN is required"}), 400
+
+    use_cache = not bool(data.get("fresh"))
+
+    try:
+        ADMISSION.check(_client_key())
+    except Rejected as e:
+        return _rejected(e)
+
+    from get_description import generate_post_text_for_asin
+
+    try:
+        job_id = GEN_JOBS.submit((asin, use_cache), generate_post_text_for_asin, asin, use_cache=use_cache)
+    except QueueFullError as e:
+        return jsonify({"ok": False, "error": str(e)}), 503
+
+    return jsonify({"ok": True, "job_id": job_id}), 202
+
+@app.route("/generate_tweet/jobs/<job_id>", methods=["GET"])
+def get_generate_job(job_id):
+    """
+    Poll a generation job. ?wait=N blocks up to N seconds for it to finish.
+    """
+    try:
+        wait = min(float(request.args.get("wait", 0)), GEN_JOB_MAX_WAIT)
+    except ValueError:
+        wait = 0
+
+    job = GEN_JOBS.get(job_id, wait=wait)
+    if not job:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+
+    body = {"ok": job["status"] != "error", "job_id": job_id, "status": job["status"]}
+    if job["status"] == "done":
+        body["post_text"] = job["result"]
+    elif job["status"] == "error":
+        body["error"] = job["error"]
+    return jsonify(body)
+
+# ---------------- BATCH GENERATION ----------------
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+@app.route("/generate_batch", methods=["POST"])
+def generate_batch():
+    """
+    Body: {"asins": [...], "concurrency": N} or a CSV/text list of ASINs.
+    Streams one JSON line per ASIN as results complete (application/x-ndjson).
+    """
+    from batch import iter_batch, parse_asins
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        asins = [str(a) for a in data.get("asins") or []]
+        concurrency = data.get("concurrency")
+    else:
+        asins = list(parse_asins(io.StringIO(request.get_data(as_text=True))))
+        concurrency = request.args.get("concurrency")
+
+    if not asins:
+        return jsonify({"ok": False, "error": "No ASINs given"}), 400
+
+    # the highest fan-out route: charged per ASIN (up to the bucket's burst)
+    try:
+        ADMISSION.check(_client_key(), cost=len(asins))
+    except Rejected as e:
+        return _rejected(e)
+
+    try:
+        concurrency = max(1, min(int(concurrency or 4), BATCH_MAX_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = 4
+
+    def lines():
+        try:
+            for record in iter_batch(asins, concurrency=concurrency):
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+        except Exception as e:
+            yield json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False) + "\n"
 
-def save_users():
-    with open(TOKEN_FILE, "w", encoding="utf-8") as f:
-        json.dump(USERS, f, ensure_ascii=False, indent=4)
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+# ------------------ USERS ------------------
+# USERS reads from the shared token store and reloads when another worker
+# changes it; assigning USERS[user_id] writes that one row through.
+TOKEN_STORE = create_token_store()
+migrate_json(TOKEN_FILE, TOKEN_STORE)
+USERS = UsersView(TOKEN_STORE)
 
 # ---------------- PKCE HELPERS ----------------
 def make_pkce_pair():
@@ -122,7 +425,7 @@ def callback():
         "Authorization": basic_auth_header(CLIENT_ID, CLIENT_SECRET),
     }
 
-    resp = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
+    resp = http_client.post(TOKEN_URL, data=data, headers=headers)
     if resp.status_code != 200:
         flash(f"Hata token alırken: {resp.status_code} {resp.text}", "error")
         return redirect("/")
@@ -138,14 +441,14 @@ def callback():
 
     # Get user info
     headers_user = {"Authorization": f"Bearer {access_token}"}
-    user_resp = requests.get(ME_URL, headers=headers_user, timeout=30)
+    user_resp = http_client.get(ME_URL, headers=headers_user)
     if user_resp.status_code != 200:
         flash(f"Kullanıcı bilgisi alınamadı: {user_resp.status_code} {user_resp.text}", "error")
         return redirect("/")
 
     user_info = user_resp.json()["data"]
 
-    # Save in USERS + file
+    # Save in token store (USERS writes through)
     USERS[user_info["id"]] = {
         "username": user_info.get("username") or user_info.get("name") or user_info["id"],
         "access_token": access_token,
@@ -153,36 +456,12 @@ def callback():
         "expires_in": expires_in,
         "obtained_at": int(time.time()),
     }
-    save_users()
 
     flash(f"Hesap eklendi: {USERS[user_info['id']]['username']}", "success")
     return redirect("/")
 
 # ---------------- TOKEN REFRESH ----------------
-def refresh_token_if_needed(user_id: str):
-    """
-    Refresh access token if expired (or close to expiry).
-    Updates USERS + users.json.
-    """
-    user = USERS.get(user_id)
-    if not user:
-        raise RuntimeError("Unknown user")
-
-    access_token = user.get("access_token")
-    refresh_token = user.get("refresh_token")
-    expires_in = int(user.get("expires_in") or 0)
-    obtained_at = int(user.get("obtained_at") or 0)
-
-    # If no expiry provided, assume token is valid (some apps may omit expires_in)
-    if access_token and expires_in and obtained_at:
-        # refresh 60 seconds early
-        if time.time() < obtained_at + expires_in - 60:
-            return  # still valid
-
-    if not refresh_token:
-        # Can't refresh; user must login again
-        raise RuntimeError("No refresh_token. Please /login again and approve offline.access scope.")
-
+def _request_token_refresh(refresh_token):
     data = {
         "grant_type": "refresh_token",
         "refresh_token": refresh_token,
@@ -193,46 +472,144 @@ def refresh_token_if_needed(user_id: str):
         "Authorization": basic_auth_header(CLIENT_ID, CLIENT_SECRET),
     }
 
-    resp = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
+    # no retries and connect + read <= TOKEN_REFRESH_TIMEOUT, so the call ends well inside the refresh lease
+    connect_timeout = min(http_client.HTTP_CONNECT_TIMEOUT, TOKEN_REFRESH_TIMEOUT / 3)
+    with metrics.stage("token_refresh"):
+        resp = http_client.post(
+            TOKEN_URL, data=data, headers=headers, retries=0,
+            timeout=(connect_timeout, TOKEN_REFRESH_TIMEOUT - connect_timeout),
+        )
     if resp.status_code != 200:
         raise RuntimeError(f"Refresh failed: {resp.status_code} {resp.text}")
+    return resp.json()
 
-    new_data = resp.json()
-    user["access_token"] = new_data.get("access_token", user["access_token"])
-    user["expires_in"] = new_data.get("expires_in", user.get("expires_in", 0))
-    user["obtained_at"] = int(time.time())
+REFRESH_MANAGER = TokenRefreshManager(TOKEN_STORE, _request_token_refresh)
+if os.getenv("TOKEN_REFRESH_BACKGROUND", "1").lower() in ("1", "true", "yes"):
+    REFRESH_MANAGER.start()
 
-    # refresh token may rotate
-    if new_data.get("refresh_token"):
-        user["refresh_token"] = new_data["refresh_token"]
-
-    USERS[user_id] = user
-    save_users()
+def refresh_token_if_needed(user_id: str):
+    """
+    Refresh access token if expired (or close to expiry).
+    Concurrent callers for the same account share one refresh (single-flight).
+    Updates the token store (and thereby USERS).
+    """
+    REFRESH_MANAGER.ensure_fresh(user_id)
 
 # ---------------- TWEET ----------------
+def send_tweet(user_id, text, retries=None):
+    """
+    POSTs the tweet with the user's current access token and returns the raw
+    response, so callers can inspect rate-limit headers.
+    """
+    headers = {
+        "Authorization": f"Bearer {USERS[user_id]['access_token']}",
+        "Content-Type": "application/json",
+    }
+    payload = {"text": text}
+
+    with metrics.stage("tweet_post"):
+        return http_client.post(TWEET_URL, headers=headers, json=payload, retries=retries)
+
 def post_tweet_v2(user_id, text):
     user = USERS.get(user_id)
     if not user:
         return False, "User not found"
 
+    # a near-duplicate would only come back as a 403 from X
+    history = get_post_history()
+    if history is not None:
+        duplicate = history.find_duplicate(user_id, text)
+        if duplicate:
+            metrics.POST_HISTORY_HITS.inc(kind="duplicate_post")
+            return False, f"Bu metin zaten gönderildi / Already posted (history #{duplicate['id']})"
+
     try:
         refresh_token_if_needed(user_id)
     except Exception as e:
         return False, f"Token refresh error: {e}"
 
-    headers = {
-        "Authorization": f"Bearer {USERS[user_id]['access_token']}",
-        "Content-Type": "application/json",
-    }
-    payload = {"text": text}
-
-    resp = requests.post(TWEET_URL, headers=headers, json=payload, timeout=30)
+    resp = send_tweet(user_id, text)
 
     # Some clients return 201, some return 200
     if resp.status_code in (200, 201):
+        if history is not None:
+            history.record_posted(user_id, text)
         return True, "Tweet gönderildi"
     return False, f"{resp.status_code} {resp.text}"
 
+# ---------------- POST QUEUE ----------------
+def _queue_send(user_id, text):
+    try:
+        refresh_token_if_needed(user_id)
+    except Exception as e:
+        raise NotSent(f"Token refresh error: {e}") from e
+    # The queue handles 429s itself (per-account pacing), so no inline retries here.
+    try:
+        resp = send_tweet(user_id, text, retries=0)
+    except Exception as e:
+        if http_client.never_sent(e):
+            raise NotSent(str(e)) from e
+        raise  # the tweet may have been created: the queue marks it 'unknown'
+    history = get_post_history()
+    if history is not None and resp.status_code in (200, 201):
+        history.record_posted(user_id, text)
+    return resp
+
+POST_QUEUE = PostQueue(send=_queue_send)
+if os.getenv("POST_QUEUE_AUTOSTART", "1").lower() in ("1", "true", "yes"):
+    POST_QUEUE.start()
+
+@app.route("/queue", methods=["POST"])
+def enqueue_posts():
+    """
+    Body: {"account": "<user id>", "texts": ["...", ...], "not_before": <epoch seconds, optional>}
+    ("text": "..." is accepted for a single post.)
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = data.get("account")
+    texts = data.get("texts") or ([data["text"]] if data.get("text") else [])
+    texts = [t.strip() for t in texts if isinstance(t, str) and t.strip()]
+
+    if not user_id or user_id not in USERS:
+        return jsonify({"ok": False, "error": "Unknown account"}), 400
+    if not texts:
+        return jsonify({"ok": False, "error": "No text given"}), 400
+
+    try:
+        ADMISSION.check(_client_key(), cost=len(texts))
+    except Rejected as e:
+        return _rejected(e)
+
+    not_before = data.get("not_before")
+    try:
+        not_before = float(not_before) if not_before is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "not_before must be epoch seconds"}), 400
+
+    # texts already posted on the account (see post_history) are skipped, not queued
+    history = get_post_history()
+    duplicates = []
+    if history is not None:
+        duplicates = [t for t in texts if history.find_duplicate(user_id, t)]
+        texts = [t for t in texts if t not in duplicates]
+        if duplicates:
+            metrics.POST_HISTORY_HITS.inc(len(duplicates), kind="duplicate_post")
+    if not texts:
+        return jsonify({"ok": False, "error": "Already posted", "duplicates": duplicates}), 409
+
+    ids = [POST_QUEUE.enqueue(user_id, t, not_before=not_before) for t in texts]
+    return jsonify({"ok": True, "ids": ids, "duplicates": duplicates}), 202
+
+@app.route("/queue", methods=["GET"])
+def queue_status():
+    status = request.args.get("status")
+    return jsonify({
+        "ok": True,
+        "counts": POST_QUEUE.counts(),
+        "rate_limits": POST_QUEUE.rate_limits(),
+        "items": POST_QUEUE.list(status=status),
+    })
+
 # ---------------- UI ----------------
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -245,10 +622,15 @@ def index():
         if not user_id or not text:
             flash("Lütfen hesap ve metin girin / Please select account & enter text", "error")
         else:
-            ok, msg = post_tweet_v2(user_id, text)
-            flash(msg, "success" if ok else "error")
+            try:
+                with ADMISSION.admit(_client_key(), upstreams=("x",)):
+                    ok, msg = post_tweet_v2(user_id, text)
+                flash(msg, "success" if ok else "error")
+            except Rejected as e:
+                flash(f"Çok fazla istek / Too many requests, retry in {e.retry_after_header}s", "error")
+                return render_template("index.html", accounts=accounts), 429, {"Retry-After": e.retry_after_header}
 
     return render_template("index.html", accounts=accounts)
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=APP_MODE != "production")
@@ -0,0 +1,123 @@
+"""
+ASGI entry point:
+
+    uvicorn asgi:app --workers 2
+
+POST /generate_tweet runs on the asyncio path (async_description), so one
+process can keep many generations in flight without a thread per request.
+It applies the same client rate limits and posting-history checks as the
+Flask route; the in-flight limits per upstream are shared with the Flask
+routes of the same process. Every other route is served by the Flask app
+through asgiref's WSGI adapter.
+"""
+import json
+
+from asgiref.wsgi import WsgiToAsgi
+
+import async_description
+from get_description import variant_count
+from admission import ADMISSION_CLIENT_HEADER, Rejected, gated
+from app import ADMISSION, app as flask_app, history_answer, record_generated
+
+_flask = WsgiToAsgi(flask_app)
+
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def _send_json(send, status, payload, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _client_key(scope):
+    """
+    app._client_key for an ASGI scope.
+    """
+    if ADMISSION_CLIENT_HEADER:
+        name = ADMISSION_CLIENT_HEADER.lower().encode("latin-1")
+        for key, value in scope.get("headers") or []:
+            if key == name and value:
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _send_rejected(send, e: Rejected):
+    await _send_json(
+        send, 429, {"ok": False, "error": str(e), "reason": e.reason},
+        headers=[(b"retry-after", e.retry_after_header.encode())],
+    )
+
+
+async def generate_tweet(scope, receive, send):
+    data = await _read_json(receive)
+    asin = (data.get("asin") or "").strip()
+    if not asin:
+        await _send_json(send, 400, {"ok": False, "error": "ASIN is required"})
+        return
+
+    use_cache = not bool(data.get("fresh"))
+
+    try:
+        ADMISSION.check(_client_key(scope))
+    except Rejected as e:
+        await _send_rejected(send, e)
+        return
+
+    try:
+        n = variant_count(data.get("variants"))
+        answered = history_answer(data, asin, n)
+        if answered is not None:
+            body, status = answered
+            await _send_json(send, status, body)
+            return
+
+        with gated():
+            if n > 1:
+                texts = variants = await async_description.generate_post_text_variants_for_asin(asin, n=n)
+                body = {"ok": True, "post_text": variants[0], "variants": variants}
+            else:
+                post_text = await async_description.generate_post_text_for_asin(asin, use_cache=use_cache)
+                texts, body = [post_text], {"ok": True, "post_text": post_text}
+
+        record_generated(asin, texts)
+        await _send_json(send, 200, body)
+    except Rejected as e:
+        await _send_rejected(send, e)
+    except Exception as e:
+        await _send_json(send, 400, {"ok": False, "error": str(e)})
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_description.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] == "http" and scope["path"] == "/generate_tweet" and scope["method"] == "POST":
+        await generate_tweet(scope, receive, send)
+        return
+
+    await _flask(scope, receive, send)
@@ -0,0 +1,263 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+import metrics
+import llm_retry
+from get_description import (
+    AmazonApiHelper,
+    FALLBACK_TWEET_CONTENT,
+    _amazon_helper_from_env,
+    _cached_content,
+    _chat_request_kwargs,
+    _estimate_tokens,
+    _response_schema,
+    _usage_tokens,
+    TWEET_TEMPERATURE,
+    build_tweet_prompts,
+    format_post_text,
+    get_deployment_pool,
+    parse_tweet_choices,
+    tweet_hashtags,
+)
+from cache import generation_cache_key, get_generation_cache
+from azure_pool import Deployment, DeploymentPool
+from admission import Rejected, get_admission_controller
+
+logger = logging.getLogger("async_description")
+
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", "100"))
+
+
+# =========================================================
+# Shared httpx client
+# =========================================================
+_http: Optional[httpx.AsyncClient] = None
+
+
+def get_async_http() -> httpx.AsyncClient:
+    """
+    Process-wide httpx.AsyncClient (keep-alive pool). Must be used from one
+    event loop, which is the case under an ASGI server.
+    """
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(float(os.getenv("HTTP_READ_TIMEOUT", "30")), connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))),
+            limits=httpx.Limits(max_connections=ASYNC_HTTP_MAX_CONNECTIONS, max_keepalive_connections=ASYNC_HTTP_MAX_CONNECTIONS),
+        )
+    return _http
+
+
+async def aclose():
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+# =========================================================
+# Amazon PA-API (async)
+# =========================================================
+async def get_item_info(amazon: AmazonApiHelper, asin: str) -> Dict[str, Any]:
+    """
+    Async AmazonApiHelper.get_item_info (same signing, cache and result shape).
+    """
+    if amazon.cache is not None:
+        cached = amazon.cache.get(amazon.marketplace, asin, amazon.associate_tag)
+        if cached is not None:
+            return cached
+
+    url, headers, request_payload = amazon._getitems_request([asin])
+    async with get_admission_controller().hold_async(("paapi",)):
+        with metrics.stage("paapi_fetch"):
+            resp = await get_async_http().post(url, headers=headers, content=request_payload)
+
+    if resp.status_code != 200:
+        raise RuntimeError(f"Amazon API error {resp.status_code}: {resp.text}")
+
+    return amazon._single_item_from_response(asin, resp.json())
+
+
+# =========================================================
+# Azure OpenAI (async)
+# =========================================================
+async def _complete(pool: DeploymentPool, dep: Deployment, estimate: int, system_prompt: str, user_prompt: str, timeout: float,
+                    n: int = 1, description_only: bool = False):
+    """
+    Async get_description._complete.
+    """
+    try:
+        async with get_admission_controller().hold_async(("azure_openai",)):
+            with metrics.stage("llm_call"):
+                raw = await dep.config.async_client.chat.completions.with_raw_response.create(
+                    **_chat_request_kwargs(dep.config.deployment, system_prompt, user_prompt, n, description_only),
+                    timeout=timeout,
+                )
+                resp = raw.parse()
+    except Rejected:
+        pool.release(dep, estimate, sent=False)
+        raise
+    except asyncio.CancelledError:
+        # client gone or ASGI timeout: the reservation must not leak, or the deployment looks full for good
+        pool.release(dep, estimate)
+        raise
+    except Exception as e:
+        pool.release(dep, estimate, headers=getattr(getattr(e, "response", None), "headers", None), error=e)
+        raise
+    pool.release(dep, estimate, _usage_tokens(resp.usage), raw.headers)
+    metrics.record_usage(resp.usage)
+    return resp
+
+
+async def _request_tweet_contents(pool: DeploymentPool, system_prompt: str, user_prompt: str, n: int = 1,
+                                  max_retries: Optional[int] = None, hashtags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Async get_description._request_tweet_contents (same deployment routing,
+    retry policy and circuit breakers).
+    """
+    policy = llm_retry.get_retry_policy()
+    deadline_at = policy.start()
+    estimate = _estimate_tokens(system_prompt, user_prompt, n)
+    failed = set()
+    attempt = 0
+
+    while True:
+        dep = pool.acquire(estimate, exclude=failed)
+        if dep is None:
+            # only rate-limited (e.g. a 429 block outlasting the backoff): wait it out if the deadline allows
+            wait = pool.blocked_for(exclude=failed)
+            if wait is not None and wait + 1.0 <= policy.remaining(deadline_at):
+                with metrics.stage("retry_sleep"):
+                    await asyncio.sleep(max(wait, 0.05))
+                continue
+            metrics.LLM_ATTEMPTS.inc(outcome="short_circuit")
+            return []
+        attempt += 1
+        try:
+            resp = await _complete(pool, dep, estimate, system_prompt, user_prompt, policy.remaining(deadline_at), n, bool(hashtags))
+
+            results = parse_tweet_choices(resp.choices, hashtags)
+            dep.breaker.record_success()
+            metrics.LLM_ATTEMPTS.inc(outcome="ok")
+            return results
+
+        except (asyncio.CancelledError, Rejected):
+            dep.breaker.release()  # no verdict; don't keep a probe taken
+            raise
+        except Exception as e:
+            if not llm_retry.is_upstream_error(e):
+                dep.breaker.release()  # a bug here says nothing about the deployment
+                raise
+            dep.breaker.record(e)
+            metrics.LLM_ATTEMPTS.inc(outcome=llm_retry.classify(e))
+            logger.warning(f"Azure OpenAI attempt {attempt} on {dep.name} failed: {e}")
+            delay = policy.next_delay(attempt, e, deadline_at, max_retries)
+            if delay is None:
+                return []
+            if llm_retry.classify(e) == llm_retry.SERVICE:
+                failed.add(dep.name)
+                if pool.available(exclude=failed):
+                    delay = 0.0  # fail over right away
+                else:
+                    failed.clear()
+                    # sleep through the block instead of waking up to an unroutable pool
+                    blocked = pool.blocked_for()
+                    if blocked is not None:
+                        if blocked + 1.0 > policy.remaining(deadline_at):
+                            return []
+                        delay = max(delay, blocked)
+            if delay:
+                with metrics.stage("retry_sleep"):
+                    await asyncio.sleep(delay)
+
+
+async def generate_tweet_content(title: str, bullets: List[str], max_retries: Optional[int] = None, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Async get_description.generate_tweet_content on AsyncAzureOpenAI.
+    """
+    pool = get_deployment_pool()
+    with metrics.stage("prompt_build"):
+        hashtags = tweet_hashtags(title, bullets)
+        system_prompt, user_prompt = build_tweet_prompts(title, bullets, description_only=bool(hashtags))
+
+    cache, cache_key, cached = _cached_content(pool, system_prompt, user_prompt, use_cache, bool(hashtags))
+    if cached is not None:
+        return cached
+
+    results = await _request_tweet_contents(pool, system_prompt, user_prompt, max_retries=max_retries, hashtags=hashtags)
+    if not results:
+        return dict(FALLBACK_TWEET_CONTENT)
+
+    if cache is not None:
+        cache.add(cache_key, results[0])
+    return results[0]
+
+
+async def generate_tweet_variants(title: str, bullets: List[str], n: int = 3, max_retries: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Async get_description.generate_tweet_variants.
+    """
+    pool = get_deployment_pool()
+    with metrics.stage("prompt_build"):
+        hashtags = tweet_hashtags(title, bullets)
+        system_prompt, user_prompt = build_tweet_prompts(title, bullets, description_only=bool(hashtags))
+
+    results = await _request_tweet_contents(pool, system_prompt, user_prompt, n=max(1, n), max_retries=max_retries, hashtags=hashtags)
+    if not results:
+        return [dict(FALLBACK_TWEET_CONTENT)]
+
+    cache = get_generation_cache()
+    if cache is not None:
+        cache_key = generation_cache_key(pool.name, system_prompt, user_prompt, _response_schema(bool(hashtags)), TWEET_TEMPERATURE)
+        for result in results:
+            cache.add(cache_key, result)
+    return results
+
+
+# =========================================================
+# Public async API
+# =========================================================
+async def generate_post_text_for_asin(asin: str, use_cache: bool = True) -> str:
+    """
+    Async get_description.generate_post_text_for_asin.
+    """
+    asin = (asin or "").strip()
+    if not asin:
+        raise ValueError("ASIN is required")
+
+    amazon = _amazon_helper_from_env()
+
+    item = await get_item_info(amazon, asin)
+    title = item.get("title") or ""
+    affiliate_url = item.get("url") or f"https://www.amazon.com/dp/{asin}"
+
+    if not title:
+        raise RuntimeError(f"PA-API returned empty title for ASIN {asin}")
+
+    ai = await generate_tweet_content(title, item.get("features") or [], use_cache=use_cache)
+    return format_post_text(ai, affiliate_url)
+
+
+async def generate_post_text_variants_for_asin(asin: str, n: int = 3) -> List[str]:
+    """
+    Async get_description.generate_post_text_variants_for_asin.
+    """
+    asin = (asin or "").strip()
+    if not asin:
+        raise ValueError("ASIN is required")
+
+    amazon = _amazon_helper_from_env()
+
+    item = await get_item_info(amazon, asin)
+    title = item.get("title") or ""
+    affiliate_url = item.get("url") or f"https://www.amazon.com/dp/{asin}"
+
+    if not title:
+        raise RuntimeError(f"PA-API returned empty title for ASIN {asin}")
+
+    variants = await generate_tweet_variants(title, item.get("features") or [], n=n)
+    return [format_post_text(ai, affiliate_url) for ai in variants]
@@ -0,0 +1,230 @@
+"""
+Offline bulk generation through the Azure OpenAI Batch API.
+
+    python batch.py asins.csv -o posts.jsonl --offline
+
+Builds one JSONL of chat-completion requests (same prompts and structured
+output as generate_tweet_content) for all ASINs, uploads it as a batch job,
+polls until Azure has finished and turns the results into the same records as
+batch.iter_batch ({"asin", "ok", "post_text" | "error"}). Batch jobs run on a
+separate quota, so large catalogue refreshes do not use the interactive TPM.
+
+The batch ids and per-ASIN metadata are kept in <output>.azure_batch.json, so
+an interrupted run resumes polling instead of submitting again.
+"""
+import os
+import io
+import json
+import time
+import logging
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+from get_description import (
+    PAAPI_MAX_ITEM_IDS,
+    _amazon_helper_from_env,
+    _chat_request_kwargs,
+    build_tweet_prompts,
+    format_post_text,
+    get_azure_client,
+    parse_tweet_content,
+    tweet_hashtags,
+)
+
+logger = logging.getLogger("azure_batch")
+
+# Global Batch deployment; defaults to the interactive one
+AZURE_OPENAI_BATCH_DEPLOYMENT = os.getenv("AZURE_OPENAI_BATCH_DEPLOYMENT") or None
+AZURE_BATCH_MAX_REQUESTS = int(os.getenv("AZURE_BATCH_MAX_REQUESTS", "50000"))  # per input file (Azure max 100k)
+AZURE_BATCH_POLL_INTERVAL = float(os.getenv("AZURE_BATCH_POLL_INTERVAL", "60"))
+AZURE_BATCH_COMPLETION_WINDOW = os.getenv("AZURE_BATCH_COMPLETION_WINDOW", "24h")
+
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+# =========================================================
+# Request file
+# =========================================================
+def build_requests(asins: Iterable[str], deployment: str, skip: Optional[Set[str]] = None
+                   ) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Fetches item metadata (GetItems, 10 per call) and returns
+    (request lines, {asin: {"url", "hashtags"}}, error records).
+    """
+    from batch import _chunks
+
+    seen = set(skip or ())
+
+    def fresh() -> Iterator[str]:
+        for asin in asins:
+            asin = (asin or "").strip()
+            if asin and asin not in seen:
+                seen.add(asin)
+                yield asin
+
+    amazon = _amazon_helper_from_env()
+    requests: List[Dict[str, Any]] = []
+    meta: Dict[str, Dict[str, Any]] = {}
+    errors: List[Dict[str, Any]] = []
+
+    for chunk in _chunks(fresh(), PAAPI_MAX_ITEM_IDS):
+        for asin, item in amazon.get_items_info(chunk).items():
+            title = item.get("title") or ""
+            if item.get("error") or not title:
+                errors.append({"asin": asin, "ok": False, "error": item.get("error") or f"PA-API returned empty title for ASIN {asin}"})
+                continue
+
+            features = item.get("features") or []
+            hashtags = tweet_hashtags(title, features)
+            system_prompt, user_prompt = build_tweet_prompts(title, features, description_only=bool(hashtags))
+            requests.append({
+                "custom_id": asin,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": _chat_request_kwargs(deployment, system_prompt, user_prompt, description_only=bool(hashtags)),
+            })
+            meta[asin] = {"url": item.get("url") or f"https://www.amazon.com/dp/{asin}", "hashtags": hashtags}
+
+    return requests, meta, errors
+
+
+# =========================================================
+# Files / batches API
+# =========================================================
+def submit(client: Any, requests: List[Dict[str, Any]]) -> str:
+    """
+    Uploads the request lines as a JSONL file and creates a batch job. Returns its id.
+    """
+    data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in requests).encode("utf-8")
+    uploaded = client.files.create(file=("requests.jsonl", io.BytesIO(data)), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint="/chat/completions",
+        completion_window=AZURE_BATCH_COMPLETION_WINDOW,
+    )
+    logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+    return batch.id
+
+
+def wait_for(client: Any, batch_id: str, poll_interval: float = AZURE_BATCH_POLL_INTERVAL, timeout: Optional[float] = None) -> Any:
+    """
+    Polls a batch until it reaches a final status. Raises RuntimeError on timeout.
+    """
+    started = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in FINAL_STATUSES:
+            return batch
+
+        counts = getattr(batch, "request_counts", None)
+        if counts is not None:
+            logger.info(f"Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done, {counts.failed} failed)")
+        if timeout is not None and time.monotonic() - started > timeout:
+            raise RuntimeError(f"Batch {batch_id} still {batch.status} after {timeout:.0f}s")
+        time.sleep(poll_interval)
+
+
+def _file_lines(client: Any, file_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+    if not file_id:
+        return
+    for line in client.files.content(file_id).text.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+# =========================================================
+# Results
+# =========================================================
+def parse_result_line(line: Dict[str, Any], meta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One output/error file line -> {"asin", "ok", "post_text" | "error"}, using the
+    same validation and formatting as generate_post_text_for_asin.
+    """
+    asin = line.get("custom_id") or ""
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or body.get("error") or {}
+        message = error.get("message") if isinstance(error, dict) else str(error)
+        return {"asin": asin, "ok": False, "error": f"Batch request failed ({response.get('status_code')}): {message}"}
+
+    try:
+        ai = parse_tweet_content(body["choices"][0]["message"]["content"], meta.get("hashtags"))
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return {"asin": asin, "ok": False, "error": f"Invalid AI response: {e}"}
+    return {"asin": asin, "ok": True, "post_text": format_post_text(ai, meta["url"])}
+
+
+def collect(client: Any, batch: Any, meta: Dict[str, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Records for every ASIN of a finished batch; ASINs missing from both
+    output and error file (e.g. an expired batch) are reported as failed.
+    """
+    seen = set()
+    for file_id in (getattr(batch, "output_file_id", None), getattr(batch, "error_file_id", None)):
+        for line in _file_lines(client, file_id):
+            asin = line.get("custom_id")
+            if asin in meta and asin not in seen:
+                seen.add(asin)
+                yield parse_result_line(line, meta[asin])
+
+    for asin in meta:
+        if asin not in seen:
+            yield {"asin": asin, "ok": False, "error": f"No result in batch {batch.id} (status {batch.status})"}
+
+
+# =========================================================
+# Run
+# =========================================================
+def _load_state(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(path: str, state: Dict[str, Any]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def iter_offline_batch(asins: Iterable[str], state_path: str, skip: Optional[Set[str]] = None,
+                       poll_interval: float = AZURE_BATCH_POLL_INTERVAL, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Offline counterpart of batch.iter_batch. Submits the requests in files of
+    at most AZURE_BATCH_MAX_REQUESTS, waits for each batch and yields its
+    records. State in `state_path` makes a rerun resume pending batches.
+    """
+    config = get_azure_client()
+    client = config.client
+
+    state = _load_state(state_path)
+    if state is None:
+        requests, meta, errors = build_requests(asins, AZURE_OPENAI_BATCH_DEPLOYMENT or config.deployment, skip)
+        for record in errors:
+            yield record
+
+        state = {"batches": []}
+        for start in range(0, len(requests), AZURE_BATCH_MAX_REQUESTS):
+            chunk = requests[start:start + AZURE_BATCH_MAX_REQUESTS]
+            batch_id = submit(client, chunk)
+            state["batches"].append({"id": batch_id, "meta": {r["custom_id"]: meta[r["custom_id"]] for r in chunk}})
+            _save_state(state_path, state)
+    else:
+        logger.info(f"Resuming {len(state['batches'])} batch(es) from {state_path}")
+
+    while state["batches"]:
+        entry = state["batches"][0]
+        batch = wait_for(client, entry["id"], poll_interval, timeout)
+        if batch.status != "completed":
+            logger.warning(f"Batch {batch.id} ended with status {batch.status}")
+        for record in collect(client, batch, entry["meta"]):
+            yield record
+
+        state["batches"].pop(0)
+        _save_state(state_path, state)
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
@@ -0,0 +1,205 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import llm_retry
+import metrics
+
+logger = logging.getLogger("azure_pool")
+
+WINDOW = 60.0  # Azure quotas are per minute
+HEADER_TTL = 60.0  # trust x-ratelimit-remaining-* for this long
+
+
+class Deployment:
+    """
+    One Azure OpenAI deployment (an AzureOpenAIConfig) plus its quota
+    accounting: tokens/requests used in the last minute, tokens reserved by
+    in-flight calls, the last x-ratelimit-remaining-* headers and a
+    retry-after block after 429s. tpm/rpm of 0 mean "unknown" (headers only).
+    """
+
+    def __init__(self, config: Any, tpm: int = 0, rpm: int = 0):
+        self.config = config
+        self.name = config.name
+        self.tpm = tpm
+        self.rpm = rpm
+        self.breaker = llm_retry.get_breaker(self.name)
+
+        self.in_flight = 0
+        self.reserved = 0
+        self.blocked_until = 0.0
+        self._used: Deque[Tuple[float, int]] = deque()  # (time, tokens)
+        self._header_tokens: Optional[Tuple[float, int]] = None  # (time, remaining)
+        self._header_requests: Optional[Tuple[float, int]] = None
+
+    def _trim(self, now: float):
+        while self._used and now - self._used[0][0] > WINDOW:
+            self._used.popleft()
+
+    def remaining(self, now: float) -> Tuple[float, float]:
+        """
+        (tokens, requests) still available this minute; inf when unknown.
+        """
+        self._trim(now)
+        tokens = requests = float("inf")
+        if self.tpm:
+            tokens = self.tpm - sum(t for _, t in self._used)
+        if self.rpm:
+            requests = self.rpm - len(self._used)
+
+        if self._header_tokens and now - self._header_tokens[0] < HEADER_TTL:
+            seen_at, value = self._header_tokens
+            tokens = min(tokens, value - sum(t for at, t in self._used if at > seen_at))
+        if self._header_requests and now - self._header_requests[0] < HEADER_TTL:
+            seen_at, value = self._header_requests
+            requests = min(requests, value - sum(1 for at, _ in self._used if at > seen_at))
+
+        return tokens - self.reserved, requests - self.in_flight
+
+    def observe_headers(self, headers: Any, now: float):
+        if not headers:
+            return
+        for key, attr in (("x-ratelimit-remaining-tokens", "_header_tokens"), ("x-ratelimit-remaining-requests", "_header_requests")):
+            value = headers.get(key)
+            if value is not None:
+                try:
+                    setattr(self, attr, (now, int(float(value))))
+                except ValueError:
+                    pass
+
+
+class DeploymentPool:
+    """
+    Routes each chat completion to the deployment with the most token headroom
+    (ties: fewest in-flight calls) and fails over on 429/5xx. All members must
+    serve the same model; `name` identifies the pool in generation cache keys.
+
+        dep = pool.acquire(estimated_tokens, exclude=failed)
+        ... dep.config.client.chat.completions.create(model=dep.config.deployment, ...)
+        pool.release(dep, estimated_tokens, used_tokens, headers, error)
+    """
+
+    def __init__(self, deployments: List[Deployment], name: Optional[str] = None):
+        if not deployments:
+            raise ValueError("DeploymentPool needs at least one deployment")
+        self.deployments = deployments
+        self.name = name or deployments[0].config.deployment
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.deployments)
+
+    def acquire(self, estimate: int, exclude: Optional[Set[str]] = None) -> Optional[Deployment]:
+        """
+        Reserves `estimate` tokens on the best deployment. None if every
+        (non-excluded) deployment is rate-limited or its circuit is open.
+        """
+        exclude = exclude or set()
+        now = time.monotonic()
+        with self._lock:
+            ranked = []
+            for dep in self.deployments:
+                if dep.name in exclude or dep.blocked_until > now:
+                    continue
+                tokens, requests = dep.remaining(now)
+                if requests < 1:
+                    continue
+                ranked.append((-tokens, dep.in_flight, dep))
+            ranked.sort(key=lambda r: r[:2])
+
+            for _, _, dep in ranked:
+                if dep.breaker.allow():
+                    dep.in_flight += 1
+                    dep.reserved += estimate
+                    metrics.LLM_ROUTED.inc(deployment=dep.name)
+                    return dep
+        return None
+
+    def available(self, exclude: Optional[Set[str]] = None) -> bool:
+        """
+        Whether acquire() could pick a deployment not in `exclude` right now
+        (ignores circuit state).
+        """
+        exclude = exclude or set()
+        now = time.monotonic()
+        with self._lock:
+            return any(
+                dep.name not in exclude and dep.blocked_until <= now and dep.remaining(now)[1] >= 1
+                for dep in self.deployments
+            )
+
+    def blocked_for(self, exclude: Optional[Set[str]] = None) -> Optional[float]:
+        """
+        Seconds until a deployment not in `exclude` that is only rate-limited
+        (429 block or this minute's request budget used up, circuit closed)
+        can take a call again; 0 if one can right now. None when no candidate
+        is merely rate-limited, i.e. waiting would not help.
+        """
+        exclude = exclude or set()
+        now = time.monotonic()
+        waits = []
+        with self._lock:
+            for dep in self.deployments:
+                if dep.name in exclude or dep.breaker.state != llm_retry.CircuitBreaker.CLOSED:
+                    continue
+                wait = max(0.0, dep.blocked_until - now)
+                if dep.remaining(now)[1] < 1:
+                    if not dep._used:
+                        continue  # only in-flight calls or headers hold it; nothing to time
+                    wait = max(wait, WINDOW - (now - dep._used[0][0]))
+                waits.append(wait)
+        return min(waits) if waits else None
+
+    def release(self, dep: Deployment, estimate: int, used_tokens: int = 0, headers: Any = None,
+                error: Optional[BaseException] = None, sent: bool = True):
+        """
+        Ends an acquire(). sent=False (the call was turned away before it went
+        out) frees the reservation without counting a request this minute.
+        """
+        now = time.monotonic()
+        with self._lock:
+            dep.in_flight -= 1
+            dep.reserved -= estimate
+            if sent:
+                dep._used.append((now, used_tokens))
+            dep.observe_headers(headers, now)
+            if error is not None and getattr(error, "status_code", None) == 429:
+                wait = llm_retry.retry_after(error)
+                dep.blocked_until = now + (wait if wait is not None else llm_retry.LLM_BACKOFF_BASE)
+                logger.info(f"Deployment {dep.name} rate-limited for {dep.blocked_until - now:.1f}s")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for dep in self.deployments:
+                tokens, requests = dep.remaining(now)
+                rows.append({
+                    "deployment": dep.name,
+                    "remaining_tokens": tokens,
+                    "remaining_requests": requests,
+                    "in_flight": dep.in_flight,
+                    "blocked": dep.blocked_until > now,
+                    "circuit": dep.breaker.state,
+                })
+            return rows
+
+    def metric_lines(self) -> List[str]:
+        rows = self.stats()
+        lines = [
+            "# HELP azp_llm_deployment_remaining_tokens Estimated tokens left this minute per deployment.",
+            "# TYPE azp_llm_deployment_remaining_tokens gauge",
+        ]
+        for row in rows:
+            if row["remaining_tokens"] != float("inf"):
+                lines.append(f'azp_llm_deployment_remaining_tokens{{deployment="{row["deployment"]}"}} {row["remaining_tokens"]}')
+        lines += [
+            "# HELP azp_llm_deployment_in_flight Chat completions in flight per deployment.",
+            "# TYPE azp_llm_deployment_in_flight gauge",
+        ]
+        for row in rows:
+            lines.append(f'azp_llm_deployment_in_flight{{deployment="{row["deployment"]}"}} {row["in_flight"]}')
+        return lines
@@ -0,0 +1,188 @@
+import os
+import io
+import csv
+import sys
+import json
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, TextIO
+
+from get_description import PAAPI_MAX_ITEM_IDS, _amazon_helper_from_env, _post_text_from_item
+
+logger = logging.getLogger("batch")
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+# =========================================================
+# Input
+# =========================================================
+def parse_asins(stream: TextIO) -> Iterator[str]:
+    """
+    Yields ASINs from CSV or plain text (one per line). For CSV the column named
+    "asin" is used if present, otherwise the first column.
+    """
+    column = 0
+    for lineno, row in enumerate(csv.reader(stream)):
+        if not row:
+            continue
+        if lineno == 0:
+            header = [c.strip().lower() for c in row]
+            if "asin" in header:
+                column = header.index("asin")
+                continue
+        if column < len(row):
+            asin = row[column].strip()
+            if asin and not asin.startswith("#"):
+                yield asin
+
+
+def _chunks(asins: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for asin in asins:
+        chunk.append(asin)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# =========================================================
+# Pipeline
+# =========================================================
+def _generate_one(asin: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return {"asin": asin, "ok": True, "post_text": _post_text_from_item(asin, item)}
+    except Exception as e:
+        return {"asin": asin, "ok": False, "error": str(e)}
+
+
+def iter_batch(asins: Iterable[str], concurrency: int = BATCH_CONCURRENCY, skip: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams one result dict per ASIN ({"asin", "ok", "post_text" | "error"}) in
+    completion order.
+
+    Metadata is fetched with batched GetItems calls (10 ASINs each) only as fast
+    as the LLM workers drain it, so memory stays bounded for large inputs.
+    ASINs in `skip` and repeated ASINs are ignored.
+    """
+    concurrency = max(1, int(concurrency))
+    seen = set(skip or ())
+
+    def fresh() -> Iterator[str]:
+        for asin in asins:
+            asin = (asin or "").strip()
+            if asin and asin not in seen:
+                seen.add(asin)
+                yield asin
+
+    amazon = _amazon_helper_from_env()
+    pending = set()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        for chunk in _chunks(fresh(), PAAPI_MAX_ITEM_IDS):
+            for asin, item in amazon.get_items_info(chunk).items():
+                if item.get("error"):
+                    yield {"asin": asin, "ok": False, "error": item["error"]}
+                    continue
+                pending.add(pool.submit(_generate_one, asin, item))
+
+            # backpressure: keep at most 2x concurrency generations queued
+            while len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+# =========================================================
+# JSONL output + checkpoint
+# =========================================================
+def load_checkpoint(path: str) -> Set[str]:
+    """
+    ASINs that already have a successful record in an existing output file.
+    Failed records are not counted, so they are retried on resume.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # truncated last line after a crash
+            if record.get("ok") and record.get("asin"):
+                done.add(record["asin"])
+    return done
+
+
+def run_batch(asins: Iterable[str], out_path: str, concurrency: int = BATCH_CONCURRENCY, resume: bool = True,
+              offline: bool = False) -> Dict[str, int]:
+    """
+    Runs iter_batch and appends each result to `out_path` as soon as it is ready.
+    With resume=True, ASINs already written successfully are skipped.
+    offline=True generates through the Azure OpenAI Batch API instead (see
+    azure_batch); concurrency is ignored then.
+    """
+    skip = load_checkpoint(out_path) if resume else set()
+    mode = "a" if resume else "w"
+
+    if mode == "a" and os.path.exists(out_path) and os.path.getsize(out_path):
+        with open(out_path, "rb") as f:
+            f.seek(-1, io.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    else:
+        needs_newline = False
+
+    summary = {"skipped": len(skip), "ok": 0, "failed": 0}
+    with open(out_path, mode, encoding="utf-8") as out:
+        if needs_newline:
+            out.write("\n")
+        if offline:
+            from azure_batch import iter_offline_batch
+
+            records = iter_offline_batch(asins, out_path + ".azure_batch.json", skip=skip)
+        else:
+            records = iter_batch(asins, concurrency=concurrency, skip=skip)
+
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            summary["ok" if record["ok"] else "failed"] += 1
+            if not record["ok"]:
+                logger.warning(f"{record['asin']}: {record['error']}")
+
+    return summary
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate tweet texts for many ASINs (JSONL output).")
+    parser.add_argument("input", help="CSV/text file with ASINs, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output file (also the resume checkpoint)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY, help="parallel LLM calls")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite output instead of resuming")
+    parser.add_argument("--offline", action="store_true", help="use the Azure OpenAI Batch API (results within the completion window)")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        summary = run_batch(parse_asins(sys.stdin), args.output, args.concurrency, resume=not args.no_resume, offline=args.offline)
+    else:
+        with open(args.input, "r", encoding="utf-8", newline="") as f:
+            summary = run_batch(parse_asins(f), args.output, args.concurrency, resume=not args.no_resume, offline=args.offline)
+
+    print(json.dumps(summary))
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
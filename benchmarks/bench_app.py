@@ -0,0 +1,183 @@
+"""
+Load benchmark for the Flask app against local mock upstreams.
+
+    python benchmarks/bench_app.py --requests 200 --concurrency 16 --latency 0.05
+
+Starts the mock X / PA-API / Azure servers (mock_servers.py), serves app.py
+on a local threaded WSGI server and drives:
+
+    generate_tweet   POST /generate_tweet
+    post_tweet       POST /  (post_tweet_v2 through the panel form)
+    token_refresh    refresh_token_if_needed with a forced refresh per call
+
+Reports requests/s and p50/p95/p99 latency per scenario. All state files go
+into a temporary directory; caches are off unless --cache is given.
+Admission control is off unless --admission is given; with it, requests
+turned away with a 429 are counted in the "429" column (and as failures).
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from mock_servers import MockServers, add_behaviour_args, behaviour_from_args  # noqa: E402
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def run_load(name: str, fn: Callable[[int], bool], total: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    failures = 0
+    lock = threading.Lock()
+
+    def one(i: int):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            ok = fn(i)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    return {
+        "scenario": name,
+        "requests": total,
+        "failures": failures,
+        "rps": total / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default="generate_tweet,post_tweet,token_refresh")
+    parser.add_argument("--cache", action="store_true", help="enable item + generation caches")
+    parser.add_argument("--admission", action="store_true", help="enable admission control (ADMISSION_* settings)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    add_behaviour_args(parser)
+    args = parser.parse_args()
+
+    behaviour = behaviour_from_args(args)
+    mocks = MockServers({name: behaviour for name in MockServers.HANDLERS}).start()
+
+    workdir = tempfile.mkdtemp(prefix="azp-bench-")
+    os.chdir(workdir)
+    os.environ.update(mocks.env())
+    os.environ.update({
+        "TOKEN_DB": os.path.join(workdir, "users.db"),
+        "STATE_DB": os.path.join(workdir, "state.db"),
+        "POST_QUEUE_DB": os.path.join(workdir, "post_queue.db"),
+        "POST_QUEUE_AUTOSTART": "0",
+        "TOKEN_REFRESH_BACKGROUND": "0",
+        "ITEM_CACHE_TTL": "86400" if args.cache else "0",
+        "GEN_CACHE_ENABLED": "1" if args.cache else "0",
+        "ADMISSION_ENABLED": "1" if args.admission else "0",
+    })
+
+    import requests
+    from werkzeug.serving import make_server
+    import app as app_module
+
+    user_id = "1000"
+    app_module.USERS[user_id] = {
+        "username": "mock_user",
+        "access_token": "mock-access",
+        "refresh_token": "mock-refresh",
+        "expires_in": 7200,
+        "obtained_at": int(time.time()),
+    }
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    local = threading.local()
+    throttled: Dict[str, int] = {}
+    throttled_lock = threading.Lock()
+
+    def count_429(name: str, resp) -> None:
+        if resp.status_code == 429:
+            with throttled_lock:
+                throttled[name] = throttled.get(name, 0) + 1
+
+    def session() -> requests.Session:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def generate_tweet(i: int) -> bool:
+        resp = session().post(f"{base}/generate_tweet", json={"asin": f"B0MOCK{i:04d}"}, timeout=120)
+        count_429("generate_tweet", resp)
+        return resp.status_code == 200 and resp.json().get("ok")
+
+    def post_tweet(i: int) -> bool:
+        resp = session().post(f"{base}/", data={"account": user_id, "text": f"benchmark tweet {i}"}, timeout=120)
+        count_429("post_tweet", resp)
+        return resp.status_code == 200 and "Tweet gönderildi" in resp.text
+
+    def token_refresh(i: int) -> bool:
+        # margin larger than any expiry forces a refresh on every call
+        app_module.REFRESH_MANAGER.ensure_fresh(user_id, margin=10**9)
+        return True
+
+    scenarios = {"generate_tweet": generate_tweet, "post_tweet": post_tweet, "token_refresh": token_refresh}
+
+    results = []
+    for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        result = run_load(name, scenarios[name], args.requests, args.concurrency)
+        result["throttled"] = throttled.get(name, 0)
+        results.append(result)
+
+    server.shutdown()
+    mocks_stats = mocks.stats()
+    mocks.stop()
+
+    if args.json:
+        for r in results:
+            print(json.dumps(r))
+        print(json.dumps({"upstream_requests": mocks_stats}))
+        return
+
+    print(f"{'scenario':<16}{'reqs':>6}{'fail':>6}{'429':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(
+            f"{r['scenario']:<16}{r['requests']:>6}{r['failures']:>6}{r['throttled']:>6}{r['rps']:>10.1f}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+        )
+    print("upstream requests:", json.dumps(mocks_stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-start / import-time benchmark.
+
+    python benchmarks/bench_import.py --module app --repeat 5
+    python benchmarks/bench_import.py --module app --forbid openai,httpx
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports the wall time of the import plus the heaviest modules by cumulative
+import time. --forbid fails (exit 1) if any of the listed packages got
+imported, e.g. to check that a posting-only worker never loads the LLM stack.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# import time: self [us] | cumulative | imported package
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_once(module: str, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """
+    Returns (total seconds, [(module, self_us, cumulative_us, depth)...]) for one cold import.
+    """
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2)), depth))
+    return float(proc.stdout.strip().splitlines()[-1]), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="heaviest top-level imports to list")
+    parser.add_argument("--forbid", default="", help="comma-separated packages that must not be imported")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="azp-import-")
+    env = dict(os.environ)
+    env.update({
+        # no background threads or state files in the repo while importing app
+        "POST_QUEUE_AUTOSTART": "0",
+        "TOKEN_REFRESH_BACKGROUND": "0",
+        "TOKEN_DB": os.path.join(workdir, "users.db"),
+        "STATE_DB": os.path.join(workdir, "state.db"),
+        "POST_QUEUE_DB": os.path.join(workdir, "post_queue.db"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+
+    # interpreter start-up imports (site, encodings, ...) are not ours
+    _, baseline = run_once("time", env)
+    startup = {name for name, _, _, _ in baseline}
+
+    totals, rows = [], []
+    for _ in range(max(1, args.repeat)):
+        total, rows = run_once(args.module, env)
+        totals.append(total)
+
+    rows = [r for r in rows if r[0] not in startup]
+    imported = {name for name, _, _, _ in rows}
+    forbidden = [p.strip() for p in args.forbid.split(",") if p.strip()]
+    leaked = sorted(p for p in forbidden if p in imported)
+    top = sorted((r for r in rows if r[3] == 0), key=lambda r: r[2], reverse=True)[:args.top]
+
+    result = {
+        "module": args.module,
+        "median_ms": statistics.median(totals) * 1000,
+        "min_ms": min(totals) * 1000,
+        "modules_imported": len(imported),
+        "forbidden_imported": leaked,
+        "top": [{"module": name, "cumulative_ms": cum / 1000} for name, _, cum, _ in top],
+    }
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"import {args.module}: median {result['median_ms']:.1f} ms, min {result['min_ms']:.1f} ms "
+              f"({len(totals)} runs, {len(imported)} modules)")
+        print(f"{'module':<32}{'cumulative ms':>14}")
+        for row in result["top"]:
+            print(f"{row['module']:<32}{row['cumulative_ms']:>14.1f}")
+        if forbidden:
+            print("forbidden imports:", ", ".join(leaked) if leaked else "none")
+
+    sys.exit(1 if leaked else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark: category lookups per second, before/after KeywordIndex.
+
+    python benchmarks/bench_keywords.py [--seconds 2] [--table-size 2000]
+
+"before" is the original lookup (the CATEGORY_HINTS dict rebuilt on every call
+and scanned with substring checks against the title only); "after" is
+keywords.KeywordIndex.category. Both are also run against a synthetic table of
+--table-size keywords to show how each scales as the keyword file grows.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from keywords import KeywordIndex, get_keyword_index  # noqa: E402
+
+TITLE = "Wireless Ergonomic Mouse with Silent Clicks, Rechargeable, for Laptop and Desktop"
+FEATURES = [
+    "Quiet clicks and smooth scrolling for focused work at your desk",
+    "Up to 18 months battery life on a single charge",
+    "Works with Windows, macOS and Linux laptops",
+    "Contoured shape supports your hand during long sessions",
+    "Plug-and-play USB receiver stores inside the mouse",
+]
+
+
+def legacy_category(title: str) -> str:
+    CATEGORY_HINTS = {
+        "dvd": "tech",
+        "disc": "office",
+        "camera": "tech",
+        "microphone": "tech",
+        "keyboard": "tech",
+        "mouse": "tech",
+        "monitor": "tech",
+        "lamp": "home",
+        "pillow": "home",
+        "shirt": "fashion",
+        "toy": "kids",
+        "pet": "pet",
+        "garden": "garden",
+        "fitness": "fitness",
+        "supplement": "wellness",
+        "bag": "travel",
+    }
+    tl = (title or "").lower()
+    for word, cat in CATEGORY_HINTS.items():
+        if word in tl:
+            return cat
+    return ""
+
+
+def linear_category(title: str, table: dict) -> str:
+    # the original algorithm on an arbitrary table
+    tl = (title or "").lower()
+    for word, cat in table.items():
+        if word in tl:
+            return cat
+    return ""
+
+
+def rate(fn, seconds: float) -> float:
+    n = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(500):
+            fn()
+        n += 500
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--table-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    index = get_keyword_index()
+    print(f"legacy: {legacy_category(TITLE)!r}  index: {index.category(TITLE, FEATURES)!r} "
+          f"(hashtags {index.hashtags(TITLE, FEATURES)})")
+
+    before = rate(lambda: legacy_category(TITLE), args.seconds)
+    after_title = rate(lambda: index.category(TITLE), args.seconds)
+    after = rate(lambda: index.category(TITLE, FEATURES), args.seconds)
+
+    print(f"before (dict rebuilt, title only):      {before:,.0f} lookups/s")
+    print(f"after  (KeywordIndex, title only):      {after_title:,.0f} lookups/s ({after_title / before:.2f}x)")
+    print(f"after  (KeywordIndex, title + features): {after:,.0f} lookups/s")
+
+    # real keywords last, so the linear scan has to pass the synthetic ones first
+    table = {f"keyword{i:05d}": "misc" for i in range(args.table_size)}
+    table.update(index.keywords)
+    big = KeywordIndex(table)
+    linear = rate(lambda: linear_category(TITLE, table), args.seconds)
+    indexed = rate(lambda: big.category(TITLE), args.seconds)
+    print(f"{len(table)} keywords, title only: linear {linear:,.0f} lookups/s, "
+          f"KeywordIndex {indexed:,.0f} lookups/s ({indexed / linear:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
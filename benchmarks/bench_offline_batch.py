@@ -0,0 +1,60 @@
+"""
+End-to-end run of the offline (Azure Batch API) mode against the local mocks.
+
+    python benchmarks/bench_offline_batch.py --asins 10000 --batch-delay 2
+
+Starts mock_servers.py, writes --asins synthetic ASINs, runs
+`batch.run_batch(..., offline=True)` and reports wall time, records/s and the
+upstream calls made. Chat completions never hit the interactive endpoint, so
+the interactive TPM limit does not apply.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+from mock_servers import MockServers, add_behaviour_args, behaviour_from_args  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--asins", type=int, default=1000)
+    add_behaviour_args(parser)
+    parser.set_defaults(latency=0.0)
+    args = parser.parse_args()
+
+    behaviour = behaviour_from_args(args)
+    mocks = MockServers({name: behaviour for name in MockServers.HANDLERS}).start()
+
+    workdir = tempfile.mkdtemp(prefix="azp-offline-")
+    os.environ.update(mocks.env())
+    os.environ.update({
+        "ITEM_CACHE_TTL": "0",
+        "AZURE_BATCH_POLL_INTERVAL": "0.2",
+    })
+
+    import batch
+
+    out_path = os.path.join(workdir, "posts.jsonl")
+    asins = [f"B0MOCK{i:05d}" for i in range(args.asins)]
+
+    start = time.perf_counter()
+    summary = batch.run_batch(asins, out_path, resume=False, offline=True)
+    wall = time.perf_counter() - start
+
+    stats = mocks.stats()
+    mocks.stop()
+
+    print(json.dumps(summary))
+    print(f"{args.asins} ASINs in {wall:.1f}s ({args.asins / wall:,.0f} records/s)")
+    print("upstream requests:", json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
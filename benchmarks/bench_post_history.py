@@ -0,0 +1,95 @@
+"""
+Micro-benchmark: near-duplicate checks against the posting history.
+
+    python benchmarks/bench_post_history.py [--posts 20000] [--lookups 2000]
+
+Fills a throwaway PostHistory with --posts synthetic tweets on one account and
+reports find_duplicate latency (p50/p99) next to a linear scan over all stored
+signatures, plus how often reworded copies (1-3 words changed, hashtags
+swapped) are caught and how often unrelated texts are flagged.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from post_history import PostHistory, minhash, similarity  # noqa: E402
+
+VOCAB = [f"word{i}" for i in range(3000)]
+HASHTAGS = ["#tech", "#gadgets", "#home", "#homedecor", "#fitness", "#workout", "#travel", "#style"]
+
+
+def tweet(rng: random.Random, asin: str) -> str:
+    words = " ".join(rng.choice(VOCAB) for _ in range(rng.randint(15, 25)))
+    tags = " ".join(rng.sample(HASHTAGS, 2))
+    return f"{words}. #amazon {tags} https://www.amazon.com/dp/{asin}?tag=demo-20"
+
+
+def reword(rng: random.Random, text: str, changes: int) -> str:
+    body, _, rest = text.partition(". #amazon")
+    words = body.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = rng.choice(VOCAB)
+    return " ".join(words) + ". #amazon" + rest
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    path = os.path.join(tempfile.mkdtemp(prefix="azp-history-"), "post_history.db")
+    history = PostHistory(path)
+
+    texts = [tweet(rng, f"B0{i:08d}") for i in range(args.posts)]
+    start = time.perf_counter()
+    for text in texts:
+        history.record_posted("bench", text)
+    print(f"recorded {args.posts} posts in {time.perf_counter() - start:.1f}s")
+
+    queries = [tweet(rng, f"B0{rng.randrange(args.posts):08d}") for _ in range(args.lookups)]
+    indexed = []
+    for text in queries:
+        t = time.perf_counter()
+        history.find_duplicate("bench", text)
+        indexed.append(time.perf_counter() - t)
+
+    signatures = [minhash(t) for t in texts]
+    linear = []
+    for text in queries[:200]:
+        t = time.perf_counter()
+        signature = minhash(text)
+        max(similarity(signature, s) for s in signatures)
+        linear.append(time.perf_counter() - t)
+
+    print(f"find_duplicate (LSH index): p50 {percentile(indexed, 0.5) * 1e6:,.0f}us  p99 {percentile(indexed, 0.99) * 1e6:,.0f}us")
+    print(f"linear scan:                p50 {percentile(linear, 0.5) * 1e6:,.0f}us  p99 {percentile(linear, 0.99) * 1e6:,.0f}us")
+
+    for changes in (1, 2, 3):
+        sample = rng.sample(texts, min(500, len(texts)))
+        caught = sum(history.find_duplicate("bench", reword(rng, t, changes)) is not None for t in sample)
+        print(f"{changes} word(s) changed: {caught / len(sample):.1%} caught")
+    retagged = rng.sample(texts, min(500, len(texts)))
+    caught = sum(
+        history.find_duplicate("bench", t.replace(t.split("#amazon ")[1].split(" https")[0], " ".join(rng.sample(HASHTAGS, 2))))
+        is not None
+        for t in retagged
+    )
+    print(f"hashtags swapped: {caught / len(retagged):.1%} caught")
+    false_positives = sum(history.find_duplicate("bench", t) is not None for t in queries)
+    print(f"unrelated texts flagged: {false_positives}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Micro-benchmark: PA-API SigV4 signatures per second, before/after SigV4Signer.
+
+    python benchmarks/bench_sigv4.py [--seconds 2]
+
+"before" is the original per-request derivation (four chained HMACs and all
+canonical strings rebuilt on every call); "after" is sigv4.SigV4Signer.
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import hashlib
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sigv4 import SigV4Signer  # noqa: E402
+
+ACCESS_KEY = "AKIDEXAMPLE"
+SECRET_KEY = "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY"
+REGION = "us-east-1"
+SERVICE = "ProductAdvertisingAPI"
+HOST = "webservices.amazon.com"
+
+
+def legacy_sign(amz_date: str, datestamp: str, request_payload: str) -> str:
+    def _hmac_sha256(key: bytes, msg: str) -> bytes:
+        return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+    algorithm = "AWS4-HMAC-SHA256"
+    canonical_headers = (
+        f"content-encoding:amz-1.0\n"
+        f"host:{HOST}\n"
+        f"x-amz-date:{amz_date}\n"
+    )
+    signed_headers = "content-encoding;host;x-amz-date"
+    payload_hash = hashlib.sha256(request_payload.encode("utf-8")).hexdigest()
+    canonical_request = (
+        f"POST\n/paapi5/getitems\n\n"
+        f"{canonical_headers}\n{signed_headers}\n{payload_hash}"
+    )
+    credential_scope = f"{datestamp}/{REGION}/{SERVICE}/aws4_request"
+    string_to_sign = (
+        f"{algorithm}\n{amz_date}\n{credential_scope}\n"
+        f"{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
+    )
+    k_date = _hmac_sha256(("AWS4" + SECRET_KEY).encode("utf-8"), datestamp)
+    k_region = _hmac_sha256(k_date, REGION)
+    k_service = _hmac_sha256(k_region, SERVICE)
+    k_signing = _hmac_sha256(k_service, "aws4_request")
+    signature = hmac.new(k_signing, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return (
+        f"{algorithm} Credential={ACCESS_KEY}/{credential_scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+
+
+def rate(fn, seconds: float) -> float:
+    n = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(500):
+            fn()
+        n += 500
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    payload = json.dumps({
+        "ItemIds": [f"B00000000{i}" for i in range(10)],
+        "Resources": ["ItemInfo.Title", "ItemInfo.Features"],
+        "PartnerTag": "tag-20",
+        "PartnerType": "Associates",
+        "Marketplace": "www.amazon.com",
+    })
+    t = datetime.datetime.utcnow()
+    amz_date = t.strftime("%Y%m%dT%H%M%SZ")
+    datestamp = t.strftime("%Y%m%d")
+
+    signer = SigV4Signer(ACCESS_KEY, SECRET_KEY, REGION, SERVICE, HOST, "/paapi5/getitems")
+    assert signer.authorization(amz_date, datestamp, payload) == legacy_sign(amz_date, datestamp, payload)
+
+    before = rate(lambda: legacy_sign(amz_date, datestamp, payload), args.seconds)
+    after = rate(lambda: signer.authorization(amz_date, datestamp, payload), args.seconds)
+
+    print(f"before (per-call key derivation): {before:,.0f} signatures/s")
+    print(f"after  (SigV4Signer, cached key): {after:,.0f} signatures/s")
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
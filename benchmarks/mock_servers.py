@@ -0,0 +1,480 @@
+"""
+Local stand-ins for the upstream APIs, for benchmarks and manual testing.
+
+    python benchmarks/mock_servers.py --latency 0.05 --error-rate 0.01 --rate-limit-rate 0.01
+
+Servers (each on its own port):
+    x       POST /2/oauth2/token, GET /2/users/me, POST /2/tweets
+    paapi   POST /paapi5/getitems
+    azure   POST /openai/deployments/<name>/chat/completions (incl. stream=true, n)
+            POST /openai/files, GET /openai/files/<id>/content,
+            POST /openai/batches, GET /openai/batches/<id>   (Batch API stub)
+
+Point the app at them with X_API_BASE_URL, AMAZON_API_ENDPOINT /
+AMAZON_API_SCHEME and AZURE_OPENAI_ENDPOINT (see MockServers.env()).
+"""
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+
+@dataclass
+class Behaviour:
+    latency: float = 0.0  # seconds added to every response
+    jitter: float = 0.0  # +- uniform seconds
+    error_rate: float = 0.0  # fraction of requests answered with 500
+    rate_limit_rate: float = 0.0  # fraction answered with 429
+    retry_after: float = 1.0  # seconds advertised on 429
+    batch_delay: float = 1.0  # seconds a Batch API job stays in_progress
+
+
+class _Handler(BaseHTTPRequestHandler, ABC):
+    """
+    Shared plumbing of the stand-ins; each upstream implements _route().
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+    behaviour: Behaviour = Behaviour()
+    stats: Dict[str, int] = {}
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------------- helpers ----------------
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _json_body(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self._body() or b"{}")
+        except ValueError:
+            return {}
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None, content_type: str = "application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _simulate(self) -> bool:
+        """
+        Applies latency and injected failures. Returns False if a failure was sent.
+        """
+        b = self.behaviour
+        delay = b.latency + (random.uniform(-b.jitter, b.jitter) if b.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < b.rate_limit_rate:
+            self._count("429")
+            self._send(429, {"title": "Too Many Requests"}, {
+                "Retry-After": str(int(b.retry_after)),
+                "x-rate-limit-remaining": "0",
+                "x-rate-limit-reset": str(int(time.time() + b.retry_after)),
+            })
+            return False
+        if roll < b.rate_limit_rate + b.error_rate:
+            self._count("500")
+            self._send(500, {"error": "injected failure"})
+            return False
+        return True
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    @abstractmethod
+    def _route(self, method: str):
+        """
+        Answers one request (method "GET" or "POST") for self.path.
+        """
+
+
+# =========================================================
+# X (Twitter) API
+# =========================================================
+class XHandler(_Handler):
+    rate_window = 900
+    rate_limit = 100_000
+
+    def _route(self, method):
+        body = self._body()
+        self._count(f"{method} {self.path.split('?')[0]}")
+        if not self._simulate():
+            return
+
+        if method == "POST" and self.path.startswith("/2/oauth2/token"):
+            self._send(200, {
+                "token_type": "bearer",
+                "access_token": "mock-access-" + uuid.uuid4().hex,
+                "refresh_token": "mock-refresh-" + uuid.uuid4().hex,
+                "expires_in": 7200,
+                "scope": "tweet.read tweet.write users.read offline.access",
+            })
+        elif method == "GET" and self.path.startswith("/2/users/me"):
+            self._send(200, {"data": {"id": "1000", "name": "Mock User", "username": "mock_user"}})
+        elif method == "POST" and self.path.startswith("/2/tweets"):
+            text = (json.loads(body or b"{}") or {}).get("text", "")
+            self._send(201, {"data": {"id": str(random.randint(10**17, 10**18)), "text": text}}, {
+                "x-rate-limit-limit": str(self.rate_limit),
+                "x-rate-limit-remaining": str(self.rate_limit - 1),
+                "x-rate-limit-reset": str(int(time.time() + self.rate_window)),
+            })
+        else:
+            self._send(404, {"error": "not found"})
+
+
+# =========================================================
+# Amazon PA-API 5
+# =========================================================
+class PaapiHandler(_Handler):
+    def _route(self, method):
+        if method != "POST" or not self.path.startswith("/paapi5/getitems"):
+            self._send(404, {"error": "not found"})
+            return
+        data = self._json_body()
+        self._count("POST /paapi5/getitems")
+        if not self._simulate():
+            return
+
+        items, errors = [], []
+        for asin in data.get("ItemIds") or []:
+            if asin.startswith("BAD"):
+                errors.append({
+                    "__type": "com.amazon.paapi5#ErrorData",
+                    "Code": "InvalidParameterValue",
+                    "Message": f"The ItemId {asin} provided in the request is invalid.",
+                })
+                continue
+            items.append({
+                "ASIN": asin,
+                "DetailPageURL": f"https://www.amazon.com/dp/{asin}?tag={data.get('PartnerTag', '')}",
+                "ItemInfo": {
+                    "Title": {"DisplayValue": f"Wireless Ergonomic Mouse {asin}"},
+                    "Features": {"DisplayValues": [
+                        "Quiet clicks and smooth scrolling",
+                        "Up to 18 months battery life",
+                        "Works with Windows, macOS and Linux",
+                    ]},
+                },
+            })
+
+        payload: Dict[str, Any] = {}
+        if items:
+            payload["ItemsResult"] = {"Items": items}
+        if errors:
+            payload["Errors"] = errors
+        self._send(200, payload)
+
+
+# =========================================================
+# Azure OpenAI chat completions
+# =========================================================
+class AzureHandler(_Handler):
+    path_re = re.compile(r"^/openai/deployments/([^/]+)/chat/completions")
+    files_re = re.compile(r"^/openai/files(?:/([^/]+)(/content)?)?$")
+    batches_re = re.compile(r"^/openai/batches(?:/([^/]+))?$")
+    tokens_per_minute = 1_000_000
+    files: Dict[str, bytes] = {}
+    batches: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _content(schema_name: str) -> str:
+        description = "Upgrade your desk with silent clicks, all-day comfort and a battery that just keeps going."
+        if schema_name == "tweet_description":  # LOCAL_HASHTAGS mode
+            return json.dumps({"description": description})
+        tags = random.sample(["#tech", "#office", "#home", "#gaming", "#setup"], 2)
+        return json.dumps({"description": description, "hashtag1": tags[0], "hashtag2": tags[1]})
+
+    def _route(self, method):
+        path = self.path.split("?")[0]
+        if self.files_re.match(path):
+            self._files(method, self.files_re.match(path))
+            return
+        if self.batches_re.match(path):
+            self._batches(method, self.batches_re.match(path))
+            return
+
+        match = self.path_re.match(self.path)
+        if method != "POST" or not match:
+            self._send(404, {"error": {"message": "not found"}})
+            return
+        deployment = match.group(1)
+        data = self._json_body()
+        self._count(f"POST chat/completions {deployment}")
+        if not self._simulate():
+            return
+
+        schema_name = (((data.get("response_format") or {}).get("json_schema") or {}).get("name")) or ""
+        n = int(data.get("n") or 1)
+        usage = {"prompt_tokens": 180, "completion_tokens": 45 * n, "total_tokens": 180 + 45 * n}
+        headers = {
+            "x-ratelimit-remaining-tokens": str(self.tokens_per_minute - usage["total_tokens"]),
+            "x-ratelimit-remaining-requests": "1000",
+        }
+        created = int(time.time())
+        completion_id = "chatcmpl-" + uuid.uuid4().hex
+
+        if data.get("stream"):
+            self._stream(completion_id, created, deployment, self._content(schema_name), headers)
+            return
+
+        self._send(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": deployment,
+            "choices": [
+                {"index": i, "finish_reason": "stop", "message": {"role": "assistant", "content": self._content(schema_name)}}
+                for i in range(n)
+            ],
+            "usage": usage,
+        }, headers)
+
+    def _completion(self, data: Dict[str, Any], deployment: str) -> Dict[str, Any]:
+        schema_name = (((data.get("response_format") or {}).get("json_schema") or {}).get("name")) or ""
+        return {
+            "id": "chatcmpl-" + uuid.uuid4().hex,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": self._content(schema_name)}}],
+            "usage": {"prompt_tokens": 180, "completion_tokens": 45, "total_tokens": 225},
+        }
+
+    # ---------------- Batch API ----------------
+    def _files(self, method: str, match):
+        file_id, content = match.group(1), match.group(2)
+        if method == "POST" and not file_id:
+            self._count("POST files")
+            # multipart/form-data: purpose + file
+            message = BytesParser(policy=email_policy).parsebytes(
+                b"Content-Type: " + self.headers.get("Content-Type", "").encode() + b"\r\n\r\n" + self._body()
+            )
+            parts = {p.get_param("name", header="content-disposition"): p for p in message.iter_parts()}
+            upload = parts.get("file")
+            data = upload.get_payload(decode=True) if upload is not None else b""
+            file_id = "file-" + uuid.uuid4().hex
+            with self.stats_lock:
+                self.files[file_id] = data
+            self._send(200, self._file_object(file_id, upload.get_filename() if upload is not None else "upload.jsonl", "batch"))
+        elif method == "GET" and file_id and file_id in self.files:
+            self._count("GET files")
+            if content:
+                self._send(200, self.files[file_id], content_type="application/octet-stream")
+            else:
+                self._send(200, self._file_object(file_id, f"{file_id}.jsonl", "batch_output"))
+        else:
+            self._send(404, {"error": {"message": "file not found"}})
+
+    def _file_object(self, file_id: str, filename: str, purpose: str) -> Dict[str, Any]:
+        return {
+            "id": file_id, "object": "file", "bytes": len(self.files.get(file_id, b"")),
+            "created_at": int(time.time()), "filename": filename, "purpose": purpose, "status": "processed",
+        }
+
+    def _batches(self, method: str, match):
+        batch_id = match.group(1)
+        if method == "POST" and not batch_id:
+            self._count("POST batches")
+            data = self._json_body()
+            batch_id = "batch_" + uuid.uuid4().hex
+            batch = {
+                "id": batch_id, "object": "batch", "endpoint": data.get("endpoint"),
+                "input_file_id": data.get("input_file_id"), "completion_window": data.get("completion_window"),
+                "status": "validating", "created_at": int(time.time()),
+                "output_file_id": None, "error_file_id": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            with self.stats_lock:
+                self.batches[batch_id] = batch
+            threading.Timer(self.behaviour.batch_delay, self._run_batch, args=(batch_id,)).start()
+            self._send(200, batch)
+        elif method == "GET" and batch_id in self.batches:
+            self._count("GET batches")
+            with self.stats_lock:
+                batch = dict(self.batches[batch_id])
+            if batch["status"] == "validating":
+                batch["status"] = "in_progress"
+            self._send(200, batch)
+        else:
+            self._send(404, {"error": {"message": "batch not found"}})
+
+    def _run_batch(self, batch_id: str):
+        batch = self.batches[batch_id]
+        lines = self.files.get(batch["input_file_id"], b"").decode("utf-8").splitlines()
+        out, err = [], []
+        for line in filter(None, (l.strip() for l in lines)):
+            request = json.loads(line)
+            body = request.get("body") or {}
+            result = {"id": "batch_req_" + uuid.uuid4().hex, "custom_id": request.get("custom_id")}
+            if random.random() < self.behaviour.error_rate:
+                result["response"] = {"status_code": 500, "body": {"error": {"message": "injected failure"}}}
+                result["error"] = {"code": "server_error", "message": "injected failure"}
+                err.append(result)
+            else:
+                result["response"] = {"status_code": 200, "body": self._completion(body, body.get("model") or "")}
+                result["error"] = None
+                out.append(result)
+
+        with self.stats_lock:
+            for name, rows in (("output_file_id", out), ("error_file_id", err)):
+                if rows:
+                    file_id = "file-" + uuid.uuid4().hex
+                    self.files[file_id] = "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+                    batch[name] = file_id
+            batch["request_counts"] = {"total": len(out) + len(err), "completed": len(out), "failed": len(err)}
+            batch["status"] = "completed"
+
+    def _stream(self, completion_id: str, created: int, deployment: str, content: str, headers: Dict[str, str]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+
+        def write(obj):
+            data = b"data: " + (obj if isinstance(obj, bytes) else json.dumps(obj).encode("utf-8")) + b"\n\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for i in range(0, len(content), 8):
+            write({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": deployment,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + 8]}, "finish_reason": None}],
+            })
+        write(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+# =========================================================
+# Server management
+# =========================================================
+def _handler_with(base: type, behaviour: Behaviour) -> type:
+    # one subclass per server so behaviour/stats are not shared between them
+    return type(base.__name__, (base,), {
+        "behaviour": behaviour, "stats": {}, "stats_lock": threading.Lock(), "files": {}, "batches": {},
+    })
+
+
+class MockServers:
+    """
+    Starts the X, PA-API and Azure stand-ins on free localhost ports.
+    """
+
+    HANDLERS = {"x": XHandler, "paapi": PaapiHandler, "azure": AzureHandler}
+
+    def __init__(self, behaviours: Optional[Dict[str, Behaviour]] = None, host: str = "127.0.0.1"):
+        behaviours = behaviours or {}
+        self.servers: Dict[str, ThreadingHTTPServer] = {}
+        for name, base in self.HANDLERS.items():
+            handler = _handler_with(base, behaviours.get(name) or Behaviour())
+            server = ThreadingHTTPServer((host, 0), handler)
+            server.daemon_threads = True
+            self.servers[name] = server
+
+    def url(self, name: str) -> str:
+        host, port = self.servers[name].server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(server.RequestHandlerClass.stats) for name, server in self.servers.items()}
+
+    def env(self) -> Dict[str, str]:
+        """
+        Environment variables that point the app at these servers.
+        """
+        return {
+            "X_API_BASE_URL": self.url("x"),
+            "AMAZON_API_ENDPOINT": self.url("paapi").split("://", 1)[1],
+            "AMAZON_API_SCHEME": "http",
+            "AMAZON_ACCESS_KEY": "AKIDMOCK",
+            "AMAZON_SECRET_KEY": "mock-secret",
+            "AMAZON_ASSOC_TAG": "mock-20",
+            "AZURE_OPENAI_ENDPOINT": self.url("azure") + "/",
+            "AZURE_OPENAI_API_KEY": "mock-key",
+            "AZURE_OPENAI_DEPLOYMENT": "mock-deployment",
+        }
+
+    def start(self):
+        for name, server in self.servers.items():
+            threading.Thread(target=server.serve_forever, name=f"mock-{name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def behaviour_from_args(args) -> Behaviour:
+    return Behaviour(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        batch_delay=args.batch_delay,
+    )
+
+
+def add_behaviour_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to each upstream response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of upstream 429s")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="seconds a Batch API job takes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local mock X / PA-API / Azure OpenAI servers.")
+    add_behaviour_args(parser)
+    args = parser.parse_args()
+
+    behaviour = behaviour_from_args(args)
+    mocks = MockServers({name: behaviour for name in MockServers.HANDLERS}).start()
+    for key, value in mocks.env().items():
+        print(f"{key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mocks.stop()
+
+
+if __name__ == "__main__":
+    main()
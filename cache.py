@@ -0,0 +1,341 @@
+import os
+import copy
+import json
+import hashlib
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+# =========================================================
+# In-process LRU tier
+# =========================================================
+class LRUCache:
+    """
+    Thread-safe LRU with a per-entry TTL. ttl <= 0 means entries never expire.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl and ttl > 0 else 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# =========================================================
+# Optional on-disk tier (SQLite)
+# =========================================================
+class SqliteCache:
+    """
+    Small JSON key/value store in SQLite with TTL and a size bound.
+    The size is checked every `trim_every` inserts (1% of max_entries by
+    default, so no COUNT(*) per insert); when the table has grown past
+    max_entries the least recently read rows are dropped.
+    Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: str, table: str = "cache", max_entries: int = 100_000, ttl: float = 0,
+                 trim_every: Optional[int] = None):
+        self.path = path
+        self.table = table
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.trim_every = max(1, int(trim_every if trim_every is not None else self.max_entries // 100))
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        (value, expires_at) for a live key; expires_at is 0 for rows without a TTL.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at and expires_at < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl and ttl > 0 else 0
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, now),
+            )
+            self._inserts += 1
+            if self._inserts % self.trim_every == 0:
+                self._trim()
+            self._conn.commit()
+
+    def _trim(self):
+        # caller holds self._lock; COUNT(*) scans the table, hence only every trim_every inserts
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+
+# =========================================================
+# PA-API item metadata cache
+# =========================================================
+ITEM_CACHE_FIELDS = ("asin", "url", "title", "features")
+
+
+class ItemCache:
+    """
+    Two-tier cache for PA-API item metadata keyed by (marketplace, ASIN,
+    associate tag); the tag is part of the key because the cached
+    DetailPageURL carries it. Reads go memory -> disk; disk hits are promoted
+    into memory for the rest of their disk TTL.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 86400,
+        max_entries: int = 1024,
+        db_path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ):
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.disk = SqliteCache(db_path, table="item_cache", max_entries=disk_max_entries, ttl=ttl) if db_path else None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _key(marketplace: str, asin: str, associate_tag: str = "") -> str:
+        return f"{marketplace}:{associate_tag}:{asin}"
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get(self, marketplace: str, asin: str, associate_tag: str = "") -> Optional[Dict[str, Any]]:
+        key = self._key(marketplace, asin, associate_tag)
+
+        item = self.memory.get(key)
+        if item is not None:
+            self._count("memory_hits")
+            return dict(item)
+
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                item, expires_at = entry
+                self._count("disk_hits")
+                # keep the disk row's expiry, so a promoted entry does not live up to 2x TTL
+                self.memory.set(key, item, ttl=max(expires_at - time.time(), 0.001) if expires_at else 0)
+                return dict(item)
+
+        self._count("misses")
+        return None
+
+    def set(self, marketplace: str, asin: str, item: Dict[str, Any], associate_tag: str = ""):
+        key = self._key(marketplace, asin, associate_tag)
+        value = {k: item.get(k) for k in ITEM_CACHE_FIELDS}
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def invalidate(self, marketplace: str, asin: str, associate_tag: str = ""):
+        key = self._key(marketplace, asin, associate_tag)
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+
+_item_cache = None
+_item_cache_lock = threading.Lock()
+
+
+def get_item_cache() -> Optional[ItemCache]:
+    """
+    Process-wide ItemCache configured from env:
+        ITEM_CACHE_TTL              seconds, 0 disables the cache (default 86400)
+        ITEM_CACHE_MAX_ENTRIES      in-process LRU size (default 1024)
+        ITEM_CACHE_DB               SQLite path for the disk tier (default: disabled)
+        ITEM_CACHE_DB_MAX_ENTRIES   disk tier size (default 100000)
+    """
+    global _item_cache
+    ttl = float(os.getenv("ITEM_CACHE_TTL", "86400"))
+    if ttl <= 0:
+        return None
+    with _item_cache_lock:
+        if _item_cache is None:
+            _item_cache = ItemCache(
+                ttl=ttl,
+                max_entries=int(os.getenv("ITEM_CACHE_MAX_ENTRIES", "1024")),
+                db_path=os.getenv("ITEM_CACHE_DB") or None,
+                disk_max_entries=int(os.getenv("ITEM_CACHE_DB_MAX_ENTRIES", "100000")),
+            )
+    return _item_cache
+
+
+# =========================================================
+# Azure OpenAI generation cache
+# =========================================================
+def generation_cache_key(deployment: str, system_prompt: str, user_prompt: str, schema: Dict[str, Any], temperature: float) -> str:
+    """
+    Content address for one chat-completions request.
+    """
+    material = json.dumps(
+        [deployment, system_prompt, user_prompt, schema, temperature],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Content-addressed cache of model outputs.
+
+    Each key holds up to `variants` distinct outputs. Until a key has that many,
+    get() reports a miss so the caller generates (and add()s) another one; once
+    full, get() rotates through the stored variants without calling the model.
+    """
+
+    def __init__(self, variants: int = 1, max_entries: int = 512, ttl: float = 3600):
+        self.variants = max(1, int(variants))
+        self._entries = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or len(entry["variants"]) < self.variants:
+                self._stats["misses"] += 1
+                return None
+            value = entry["variants"][entry["cursor"] % len(entry["variants"])]
+            entry["cursor"] += 1
+            self._stats["hits"] += 1
+            return copy.deepcopy(value)
+
+    def add(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"variants": [], "cursor": 0}
+                self._entries.set(key, entry)
+            if value in entry["variants"]:
+                return
+            entry["variants"].append(copy.deepcopy(value))
+            del entry["variants"][:-self.variants]
+
+    def record_bypass(self):
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["entries"] = len(self._entries)
+        return stats
+
+
+_generation_cache = None
+_generation_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> Optional[GenerationCache]:
+    """
+    Process-wide GenerationCache configured from env (disabled unless GEN_CACHE_ENABLED=1):
+        GEN_CACHE_VARIANTS      outputs kept and rotated per key (default 1)
+        GEN_CACHE_MAX_ENTRIES   number of keys kept (default 512)
+        GEN_CACHE_TTL           seconds (default 3600)
+    """
+    global _generation_cache
+    if os.getenv("GEN_CACHE_ENABLED", "0").lower() not in ("1", "true", "yes"):
+        return None
+    with _generation_cache_lock:
+        if _generation_cache is None:
+            _generation_cache = GenerationCache(
+                variants=int(os.getenv("GEN_CACHE_VARIANTS", "1")),
+                max_entries=int(os.getenv("GEN_CACHE_MAX_ENTRIES", "512")),
+                ttl=float(os.getenv("GEN_CACHE_TTL", "3600")),
+            )
+    return _generation_cache
@@ -1,15 +1,24 @@
 import os
+import re
 import json
 import time
-import hashlib
-import hmac
 import datetime
 import logging
-from typing import Dict, Any, List
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Iterator, Set, Tuple
 
-import requests
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+
+import http_client
+import metrics
+import llm_retry
+from azure_pool import Deployment, DeploymentPool
+from keywords import get_keyword_index
+from sigv4 import SigV4Signer
+from cache import ItemCache, get_item_cache, generation_cache_key, get_generation_cache
+from admission import Rejected, get_admission_controller
+
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
 
 load_dotenv()
 
@@ -22,31 +31,89 @@ if not logger.handlers:
 # Azure OpenAI Configuration
 # =========================================================
 class AzureOpenAIConfig:
-    def __init__(self):
-        self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "https://ai-services-az-1.openai.azure.com/")
-        self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        self.deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
-        self.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+    def __init__(self, endpoint: Optional[str] = None, api_key: Optional[str] = None,
+                 deployment: Optional[str] = None, api_version: Optional[str] = None):
+        self.endpoint = endpoint or os.getenv("AZURE_OPENAI_ENDPOINT", "https://ai-services-az-1.openai.azure.com/")
+        self.api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY")
+        self.deployment = deployment or os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
+        self.api_version = api_version or os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
 
         if not self.api_key:
             raise ValueError("AZURE_OPENAI_API_KEY not found in environment variables")
 
+        # identifies this deployment in routing, circuit breakers and metrics
+        self.name = f"{self.endpoint.split('://', 1)[-1].strip('/')}/{self.deployment}"
+
+        # imported here: the SDK is the heaviest import in the app and only
+        # generation needs it
+        from openai import AzureOpenAI
+
         self.client = AzureOpenAI(
             api_version=self.api_version,
             azure_endpoint=self.endpoint,
             api_key=self.api_key,
+            max_retries=0,  # retries are handled by llm_retry.RetryPolicy
         )
+        self._async_client = None
+
+    @property
+    def async_client(self) -> "AsyncAzureOpenAI":
+        # created on first use so sync-only processes never build it
+        if self._async_client is None:
+            from openai import AsyncAzureOpenAI
+
+            self._async_client = AsyncAzureOpenAI(
+                api_version=self.api_version,
+                azure_endpoint=self.endpoint,
+                api_key=self.api_key,
+                max_retries=0,
+            )
+        return self._async_client
 
 
-_azure_config = None
+def get_azure_client() -> AzureOpenAIConfig:
+    """
+    The first deployment of the pool (see get_deployment_pool).
+    """
+    return get_deployment_pool().deployments[0].config
 
 
-def get_azure_client() -> AzureOpenAIConfig:
-    global _azure_config
-    if _azure_config is None:
+_deployment_pool = None
+
+
+def get_deployment_pool() -> DeploymentPool:
+    """
+    Process-wide pool of Azure OpenAI deployments. AZURE_OPENAI_POOL is a JSON
+    list of {"endpoint", "deployment", "api_key", "api_version", "tpm", "rpm"}
+    (missing fields fall back to the AZURE_OPENAI_* variables); without it the
+    pool has the single AZURE_OPENAI_DEPLOYMENT, with optional
+    AZURE_OPENAI_TPM / AZURE_OPENAI_RPM quotas. All members must serve the
+    same model.
+    """
+    global _deployment_pool
+    if _deployment_pool is None:
         logger.info("Initializing Azure OpenAI client...")
-        _azure_config = AzureOpenAIConfig()
-    return _azure_config
+        entries = json.loads(os.getenv("AZURE_OPENAI_POOL") or "[]") or [{
+            "tpm": os.getenv("AZURE_OPENAI_TPM", "0"),
+            "rpm": os.getenv("AZURE_OPENAI_RPM", "0"),
+        }]
+        deployments = [
+            Deployment(
+                AzureOpenAIConfig(
+                    endpoint=entry.get("endpoint"),
+                    api_key=entry.get("api_key"),
+                    deployment=entry.get("deployment"),
+                    api_version=entry.get("api_version"),
+                ),
+                tpm=int(entry.get("tpm") or 0),
+                rpm=int(entry.get("rpm") or 0),
+            )
+            for entry in entries
+        ]
+        pool = DeploymentPool(deployments, name=os.getenv("AZURE_OPENAI_DEPLOYMENT"))
+        metrics.REGISTRY.add_collector(pool.metric_lines)
+        _deployment_pool = pool
+    return _deployment_pool
 
 
 # =========================================================
@@ -63,10 +130,23 @@ TWEET_SCHEMA = {
     "additionalProperties": False,
 }
 
+# local hashtags mode: the model only writes the description
+DESCRIPTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "description": {"type": "string", "description": "Promotional tweet description, maximum 25 words"},
+    },
+    "required": ["description"],
+    "additionalProperties": False,
+}
+
 
 # =========================================================
 # Amazon PA-API Helper (Title + Features + Affiliate URL)
 # =========================================================
+PAAPI_MAX_ITEM_IDS = 10  # GetItems accepts at most 10 ItemIds per request
+
+
 class AmazonApiHelper:
     def __init__(
         self,
@@ -76,6 +156,8 @@ class AmazonApiHelper:
         region: str = "us-east-1",
         endpoint: str = "webservices.amazon.com",
         marketplace: str = "www.amazon.com",
+        cache: Optional[ItemCache] = None,
+        scheme: str = "https",
     ):
         self.access_key = access_key
         self.secret_key = secret_key
@@ -83,62 +165,31 @@ class AmazonApiHelper:
         self.region = region
         self.endpoint = endpoint
         self.marketplace = marketplace
+        self.scheme = scheme
         self.service = "ProductAdvertisingAPI"
-
-    def _hmac_sha256(self, key: bytes, msg: str) -> bytes:
-        return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
-
-    def _sign_auth_header(self, amz_date: str, datestamp: str, request_payload: str) -> str:
-        algorithm = "AWS4-HMAC-SHA256"
-        method = "POST"
-        canonical_uri = "/paapi5/getitems"
-        canonical_querystring = ""
-        canonical_headers = (
-            f"content-encoding:amz-1.0\n"
-            f"host:{self.endpoint}\n"
-            f"x-amz-date:{amz_date}\n"
+        self.cache = cache
+        self._signer = SigV4Signer(
+            access_key=access_key,
+            secret_key=secret_key or "",
+            region=region,
+            service=self.service,
+            host=endpoint,
+            canonical_uri="/paapi5/getitems",
         )
-        signed_headers = "content-encoding;host;x-amz-date"
 
-        payload_hash = hashlib.sha256(request_payload.encode("utf-8")).hexdigest()
-        canonical_request = (
-            f"{method}\n{canonical_uri}\n{canonical_querystring}\n"
-            f"{canonical_headers}\n{signed_headers}\n{payload_hash}"
-        )
-
-        credential_scope = f"{datestamp}/{self.region}/{self.service}/aws4_request"
-        string_to_sign = (
-            f"{algorithm}\n{amz_date}\n{credential_scope}\n"
-            f"{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
-        )
-
-        k_date = self._hmac_sha256(("AWS4" + self.secret_key).encode("utf-8"), datestamp)
-        k_region = self._hmac_sha256(k_date, self.region)
-        k_service = self._hmac_sha256(k_region, self.service)
-        k_signing = self._hmac_sha256(k_service, "aws4_request")
-
-        signature = hmac.new(k_signing, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
-
-        return (
-            f"{algorithm} Credential={self.access_key}/{credential_scope}, "
-            f"SignedHeaders={signed_headers}, Signature={signature}"
-        )
+    def _sign_auth_header(self, amz_date: str, datestamp: str, request_payload: str) -> str:
+        return self._signer.authorization(amz_date, datestamp, request_payload)
 
-    def get_item_info(self, asin: str) -> Dict[str, Any]:
+    def _getitems_request(self, asins: List[str]) -> Tuple[str, Dict[str, str], str]:
         """
-        Returns:
-            {
-              "asin": "...",
-              "url": "affiliate DetailPageURL",
-              "title": "...",
-              "features": ["...", ...]
-            }
+        Builds one signed GetItems request for up to PAAPI_MAX_ITEM_IDS ASINs.
+        Returns (url, headers, payload); shared by the sync and async clients.
         """
         if not self.access_key or not self.secret_key or not self.associate_tag:
             raise ValueError("Amazon API credentials missing. Set AMAZON_ACCESS_KEY / AMAZON_SECRET_KEY / AMAZON_ASSOC_TAG")
 
         request_payload = json.dumps({
-            "ItemIds": [asin],
+            "ItemIds": list(asins),
             "Resources": [
                 "ItemInfo.Title",
                 "ItemInfo.Features",
@@ -161,62 +212,127 @@ class AmazonApiHelper:
         }
         headers["Authorization"] = self._sign_auth_header(amz_date, datestamp, request_payload)
 
-        url = f"https://{self.endpoint}/paapi5/getitems"
-        resp = requests.post(url, headers=headers, data=request_payload, timeout=20)
+        url = f"{self.scheme}://{self.endpoint}/paapi5/getitems"
+        return url, headers, request_payload
+
+    def _post_getitems(self, asins: List[str]) -> Dict[str, Any]:
+        """
+        Sends one signed GetItems request and returns the decoded response body.
+        Holds a "paapi" admission slot for the request only (inside
+        admission.gated(); raises Rejected).
+        """
+        url, headers, request_payload = self._getitems_request(asins)
+        with get_admission_controller().hold(("paapi",)), metrics.stage("paapi_fetch"):
+            resp = http_client.post(url, headers=headers, data=request_payload, idempotent=True)  # GetItems is a read
 
         if resp.status_code != 200:
             raise RuntimeError(f"Amazon API error {resp.status_code}: {resp.text}")
 
-        data = resp.json()
-        items = (data.get("ItemsResult") or {}).get("Items") or []
-        if not items:
-            raise RuntimeError(f"No item returned for ASIN {asin}")
+        return resp.json()
 
-        item = items[0]
+    @staticmethod
+    def _parse_item(item: Dict[str, Any]) -> Dict[str, Any]:
         detail_url = item.get("DetailPageURL") or ""
 
         title = (((item.get("ItemInfo") or {}).get("Title") or {}).get("DisplayValue")) or ""
         features = (((item.get("ItemInfo") or {}).get("Features") or {}).get("DisplayValues")) or []
 
-        return {"asin": asin, "url": detail_url, "title": title, "features": features}
+        return {"asin": item.get("ASIN") or "", "url": detail_url, "title": title, "features": features}
 
+    def get_item_info(self, asin: str) -> Dict[str, Any]:
+        """
+        Returns:
+            {
+              "asin": "...",
+              "url": "affiliate DetailPageURL",
+              "title": "...",
+              "features": ["...", ...]
+            }
+        """
+        if self.cache is not None:
+            cached = self.cache.get(self.marketplace, asin, self.associate_tag)
+            if cached is not None:
+                return cached
 
-# =========================================================
-# Azure OpenAI: Generate Description + 2 Hashtags
-# =========================================================
-def generate_tweet_content(title: str, bullets: List[str], max_retries: int = 3) -> Dict[str, Any]:
-    config = get_azure_client()
+        data = self._post_getitems([asin])
+        return self._single_item_from_response(asin, data)
 
-    product_info = f"Product: {title}\n\nKey Features:\n"
-    product_info += "\n".join([f"- {b}" for b in bullets[:6] if b])
+    def _single_item_from_response(self, asin: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        items = (data.get("ItemsResult") or {}).get("Items") or []
+        if not items:
+            raise RuntimeError(f"No item returned for ASIN {asin}")
 
-    CATEGORY_HINTS = {
-        "dvd": "tech",
-        "disc": "office",
-        "camera": "tech",
-        "microphone": "tech",
-        "keyboard": "tech",
-        "mouse": "tech",
-        "monitor": "tech",
-        "lamp": "home",
-        "pillow": "home",
-        "shirt": "fashion",
-        "toy": "kids",
-        "pet": "pet",
-        "garden": "garden",
-        "fitness": "fitness",
-        "supplement": "wellness",
-        "bag": "travel",
-    }
+        info = self._parse_item(items[0])
+        info["asin"] = asin
+        if self.cache is not None:
+            self.cache.set(self.marketplace, asin, info, self.associate_tag)
+        return info
 
-    category_hint = ""
-    tl = (title or "").lower()
-    for word, cat in CATEGORY_HINTS.items():
-        if word in tl:
-            category_hint = cat
-            break
+    def get_items_info(self, asins: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Bulk variant of get_item_info. Sends one signed GetItems request per
+        PAAPI_MAX_ITEM_IDS ASINs.
+
+        Returns a dict keyed by ASIN (input order, duplicates dropped). Each value
+        is either the get_item_info() dict or {"asin": "...", "error": "..."}.
+        A failed chunk marks only its own ASINs as failed.
+        """
+        unique: List[str] = []
+        seen = set()
+        for a in asins:
+            a = (a or "").strip()
+            if a and a not in seen:
+                seen.add(a)
+                unique.append(a)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        to_fetch = unique
+        if self.cache is not None:
+            to_fetch = []
+            for a in unique:
+                cached = self.cache.get(self.marketplace, a, self.associate_tag)
+                if cached is not None:
+                    results[a] = cached
+                else:
+                    to_fetch.append(a)
+
+        for i in range(0, len(to_fetch), PAAPI_MAX_ITEM_IDS):
+            chunk = to_fetch[i:i + PAAPI_MAX_ITEM_IDS]
+            try:
+                data = self._post_getitems(chunk)
+            except Rejected:
+                raise  # the caller is being turned away, not these ASINs
+            except Exception as e:
+                for a in chunk:
+                    results[a] = {"asin": a, "error": str(e)}
+                continue
+
+            for item in (data.get("ItemsResult") or {}).get("Items") or []:
+                info = self._parse_item(item)
+                if info["asin"] in seen:
+                    results[info["asin"]] = info
+                    if self.cache is not None:
+                        self.cache.set(self.marketplace, info["asin"], info, self.associate_tag)
+
+            # PA-API reports bad ItemIds in a top-level Errors array; the ASIN
+            # only appears inside the message text.
+            for err in data.get("Errors") or []:
+                message = f"{err.get('Code', 'Error')}: {err.get('Message', '')}".strip()
+                for a in chunk:
+                    if a not in results and a in (err.get("Message") or ""):
+                        results[a] = {"asin": a, "error": message}
+
+            for a in chunk:
+                if a not in results:
+                    results[a] = {"asin": a, "error": f"No item returned for ASIN {a}"}
+
+        return {a: results[a] for a in unique}
 
-    system_prompt = """You write short, persuasive promotional tweets for X (Twitter).
+
+# =========================================================
+# Azure OpenAI: Generate Description + 2 Hashtags
+# =========================================================
+SYSTEM_PROMPT = """You write short, persuasive promotional tweets for X (Twitter).
 
 STRICT OUTPUT RULES:
 - Return JSON only, matching the provided schema.
@@ -225,83 +341,486 @@ STRICT OUTPUT RULES:
 - hashtags must be different.
 """
 
+DESCRIPTION_SYSTEM_PROMPT = """You write short, persuasive promotional tweets for X (Twitter).
+
+STRICT OUTPUT RULES:
+- Return JSON only, matching the provided schema.
+- description: maximum 25 words, benefit-focused, salesy, human tone, no brand names, no product codes, no ASIN, no hashtags.
+"""
+
+TWEET_TEMPERATURE = 0.7
+
+# LOCAL_HASHTAGS=1 picks both hashtags from category_keywords.json (keywords.py)
+# instead of asking the model, which also shortens schema and completion
+LOCAL_HASHTAGS = os.getenv("LOCAL_HASHTAGS", "0").lower() in ("1", "true", "yes")
+
+MAX_TWEET_VARIANTS = int(os.getenv("GEN_MAX_VARIANTS", "5"))  # cap for n in variants mode
+
+FALLBACK_TWEET_CONTENT = {
+    "description": "Discover a must-have upgrade that makes everyday life easier—bring it home today!",
+    "hashtags": ["#home", "#lifestyle"],
+}
+
+
+def tweet_hashtags(title: str, bullets: List[str]) -> Optional[List[str]]:
+    """
+    The two hashtags chosen locally in LOCAL_HASHTAGS mode, else None (the
+    model picks them).
+    """
+    if not LOCAL_HASHTAGS:
+        return None
+    return get_keyword_index().hashtags(title, bullets)
+
+
+def build_tweet_prompts(title: str, bullets: List[str], description_only: bool = False) -> Tuple[str, str]:
+    """
+    Returns (system_prompt, user_prompt) for one product. description_only
+    leaves hashtags out of the prompt (LOCAL_HASHTAGS mode).
+    """
+    product_info = f"Product: {title}\n\nKey Features:\n"
+    product_info += "\n".join([f"- {b}" for b in bullets[:6] if b])
+
+    category_hint = get_keyword_index().category(title, bullets)
+
+    if description_only:
+        user_prompt = f"""{product_info}
+
+Generate the tweet description."""
+        if category_hint:
+            user_prompt += f"\nProduct theme: {category_hint}"
+        return DESCRIPTION_SYSTEM_PROMPT, user_prompt
+
     user_prompt = f"""{product_info}
 
 Generate tweet content with EXACTLY 2 category hashtags."""
     if category_hint:
         user_prompt += f"\nTry to align hashtags with theme: {category_hint}"
 
-    for attempt in range(1, max_retries + 1):
-        try:
-            resp = config.client.chat.completions.create(
-                model=config.deployment,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "tweet_content",
-                        "strict": True,
-                        "schema": TWEET_SCHEMA,
-                    },
-                },
-                temperature=0.7,
-                top_p=0.9,
-                max_completion_tokens=250,
-            )
+    return SYSTEM_PROMPT, user_prompt
+
+
+def _response_schema(description_only: bool = False) -> Dict[str, Any]:
+    """
+    The JSON schema a request is sent with; also part of its generation cache key.
+    """
+    return DESCRIPTION_SCHEMA if description_only else TWEET_SCHEMA
+
+
+def _chat_request_kwargs(deployment: str, system_prompt: str, user_prompt: str, n: int = 1,
+                         description_only: bool = False) -> Dict[str, Any]:
+    kwargs = {
+        "model": deployment,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "tweet_description" if description_only else "tweet_content",
+                "strict": True,
+                "schema": _response_schema(description_only),
+            },
+        },
+        "temperature": TWEET_TEMPERATURE,
+        "top_p": 0.9,
+        "max_completion_tokens": 150 if description_only else 250,
+    }
+    if n > 1:
+        kwargs["n"] = n  # one prompt charge for n candidates
+    return kwargs
+
+
+def parse_tweet_content(raw: str, hashtags: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Validates one structured-output completion and normalises it to
+    {"description": "...", "hashtags": ["#a", "#b"]}. Raises ValueError.
+    hashtags (LOCAL_HASHTAGS mode) are used instead of hashtag1/hashtag2.
+    """
+    data = json.loads((raw or "").strip())
+    if not isinstance(data, dict):
+        raise ValueError("AI response is not a JSON object")
+
+    def text(key: str) -> str:
+        value = data.get(key)
+        return value.strip() if isinstance(value, str) else ""
+
+    desc = text("description")
+    if hashtags:
+        hashtag1, hashtag2 = (h.strip().lower() for h in hashtags[:2])
+    else:
+        hashtag1 = text("hashtag1").lower()
+        hashtag2 = text("hashtag2").lower()
+
+    if not desc or not hashtag1 or not hashtag2:
+        raise ValueError("Incomplete AI response")
+
+    if not hashtag1.startswith("#"):
+        hashtag1 = f"#{hashtag1}"
+    if not hashtag2.startswith("#"):
+        hashtag2 = f"#{hashtag2}"
+    if hashtag1 == hashtag2:
+        hashtag2 = "#lifestyle"
 
-            raw = (resp.choices[0].message.content or "").strip()
-            data = json.loads(raw)
+    # Enforce 25 words max
+    words = desc.split()
+    if len(words) > 25:
+        desc = " ".join(words[:25])
 
-            desc = (data.get("description") or "").strip()
-            hashtag1 = (data.get("hashtag1") or "").strip().lower()
-            hashtag2 = (data.get("hashtag2") or "").strip().lower()
+    return {"description": desc, "hashtags": [hashtag1, hashtag2]}
 
-            if not desc or not hashtag1 or not hashtag2:
-                raise ValueError("Incomplete AI response")
 
-            if not hashtag1.startswith("#"):
-                hashtag1 = f"#{hashtag1}"
-            if not hashtag2.startswith("#"):
-                hashtag2 = f"#{hashtag2}"
-            if hashtag1 == hashtag2:
-                hashtag2 = "#lifestyle"
+def _cached_content(pool: DeploymentPool, system_prompt: str, user_prompt: str, use_cache: bool, description_only: bool = False):
+    """
+    Returns (cache, cache_key, cached_result). cache is None when disabled.
+    """
+    cache = get_generation_cache()
+    if cache is None:
+        return None, None, None
+
+    cache_key = generation_cache_key(pool.name, system_prompt, user_prompt, _response_schema(description_only), TWEET_TEMPERATURE)
+    if not use_cache:
+        cache.record_bypass()
+        return cache, cache_key, None
+    return cache, cache_key, cache.get(cache_key)
+
 
-            # Enforce 25 words max
-            words = desc.split()
-            if len(words) > 25:
-                desc = " ".join(words[:25])
+def _estimate_tokens(system_prompt: str, user_prompt: str, n: int = 1) -> int:
+    # ~4 characters per token plus the completion budget of each choice
+    return (len(system_prompt) + len(user_prompt)) // 4 + 250 * n
 
-            return {"description": desc, "hashtags": [hashtag1, hashtag2]}
 
+def _usage_tokens(usage: Any) -> int:
+    return int(getattr(usage, "total_tokens", 0) or 0) if usage is not None else 0
+
+
+def _complete(pool: DeploymentPool, dep: Deployment, estimate: int, system_prompt: str, user_prompt: str, timeout: float,
+              n: int = 1, description_only: bool = False):
+    """
+    One chat completion on `dep`; returns the parsed response and releases the
+    pool reservation with the reported usage and rate-limit headers. Holds an
+    "azure_openai" admission slot for the call only (inside admission.gated();
+    raises Rejected).
+    """
+    try:
+        with get_admission_controller().hold(("azure_openai",)), metrics.stage("llm_call"):
+            raw = dep.config.client.chat.completions.with_raw_response.create(
+                **_chat_request_kwargs(dep.config.deployment, system_prompt, user_prompt, n, description_only),
+                timeout=timeout,
+            )
+            resp = raw.parse()
+    except Rejected:
+        pool.release(dep, estimate, sent=False)
+        raise
+    except Exception as e:
+        pool.release(dep, estimate, headers=getattr(getattr(e, "response", None), "headers", None), error=e)
+        raise
+    pool.release(dep, estimate, _usage_tokens(resp.usage), raw.headers)
+    metrics.record_usage(resp.usage)
+    return resp
+
+
+def parse_tweet_choices(choices: List[Any], hashtags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Validates every choice of a completion (see parse_tweet_content) and drops
+    invalid ones and duplicate descriptions. Raises ValueError if none is usable.
+    """
+    results, seen = [], set()
+    for choice in choices:
+        try:
+            result = parse_tweet_content(choice.message.content, hashtags)
+        except ValueError as e:
+            logger.info(f"Dropping invalid choice {getattr(choice, 'index', '?')}: {e}")
+            continue
+        key = result["description"].lower()
+        if key not in seen:
+            seen.add(key)
+            results.append(result)
+    if not results:
+        raise ValueError("No valid choice in AI response")
+    return results
+
+
+def _acquire(pool: DeploymentPool, estimate: int, policy: llm_retry.RetryPolicy, deadline_at: float,
+             exclude: Optional[Set[str]] = None) -> Optional[Deployment]:
+    """
+    pool.acquire(), waiting out a deployment that is only rate-limited (e.g. a
+    429 block outlasting the backoff) if the deadline allows. None when no
+    deployment can take the call in time.
+    """
+    while True:
+        dep = pool.acquire(estimate, exclude=exclude)
+        if dep is not None:
+            return dep
+        wait = pool.blocked_for(exclude=exclude)
+        if wait is None or wait + 1.0 > policy.remaining(deadline_at):
+            metrics.LLM_ATTEMPTS.inc(outcome="short_circuit")
+            return None
+        with metrics.stage("retry_sleep"):
+            time.sleep(max(wait, 0.05))
+
+
+def _request_tweet_contents(pool: DeploymentPool, system_prompt: str, user_prompt: str, n: int = 1,
+                            max_retries: Optional[int] = None, hashtags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Requests n candidates in one call and returns the valid ones ([] when every
+    attempt failed). With local hashtags the model only writes descriptions. Each attempt goes to the pool deployment with the most
+    headroom; after a 429/5xx the next attempt fails over to another deployment
+    without sleeping. Retries follow llm_retry.RetryPolicy (max_retries
+    overrides its attempt count).
+    """
+    policy = llm_retry.get_retry_policy()
+    deadline_at = policy.start()
+    estimate = _estimate_tokens(system_prompt, user_prompt, n)
+    failed = set()
+    attempt = 0
+
+    while True:
+        dep = _acquire(pool, estimate, policy, deadline_at, exclude=failed)
+        if dep is None:
+            return []
+        attempt += 1
+        try:
+            resp = _complete(pool, dep, estimate, system_prompt, user_prompt, policy.remaining(deadline_at), n, bool(hashtags))
+
+            results = parse_tweet_choices(resp.choices, hashtags)
+            dep.breaker.record_success()
+            metrics.LLM_ATTEMPTS.inc(outcome="ok")
+            return results
+
+        except Rejected:
+            dep.breaker.release()  # not sent: no verdict on the deployment
+            raise
         except Exception as e:
-            logger.warning(f"Azure OpenAI attempt {attempt} failed: {e}")
-            time.sleep(2 ** attempt)
+            if not llm_retry.is_upstream_error(e):
+                dep.breaker.release()  # a bug here says nothing about the deployment
+                raise
+            dep.breaker.record(e)
+            metrics.LLM_ATTEMPTS.inc(outcome=llm_retry.classify(e))
+            logger.warning(f"Azure OpenAI attempt {attempt} on {dep.name} failed: {e}")
+            delay = policy.next_delay(attempt, e, deadline_at, max_retries)
+            if delay is None:
+                return []
+            if llm_retry.classify(e) == llm_retry.SERVICE:
+                failed.add(dep.name)
+                if pool.available(exclude=failed):
+                    delay = 0.0  # fail over right away
+                else:
+                    failed.clear()
+                    # sleep through the block instead of waking up to an unroutable pool
+                    blocked = pool.blocked_for()
+                    if blocked is not None:
+                        if blocked + 1.0 > policy.remaining(deadline_at):
+                            return []
+                        delay = max(delay, blocked)
+            if delay:
+                with metrics.stage("retry_sleep"):
+                    time.sleep(delay)
+
+
+def generate_tweet_content(title: str, bullets: List[str], max_retries: Optional[int] = None, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    use_cache=False skips the generation cache lookup (the fresh result is still
+    stored as a new variant). When every attempt fails, or every deployment is
+    rate-limited or its circuit is open, the fallback content is returned.
+    """
+    pool = get_deployment_pool()
+    with metrics.stage("prompt_build"):
+        hashtags = tweet_hashtags(title, bullets)
+        system_prompt, user_prompt = build_tweet_prompts(title, bullets, description_only=bool(hashtags))
 
-    # fallback
-    return {
-        "description": "Discover a must-have upgrade that makes everyday life easier—bring it home today!",
-        "hashtags": ["#home", "#lifestyle"],
-    }
+    cache, cache_key, cached = _cached_content(pool, system_prompt, user_prompt, use_cache, bool(hashtags))
+    if cached is not None:
+        return cached
+
+    results = _request_tweet_contents(pool, system_prompt, user_prompt, max_retries=max_retries, hashtags=hashtags)
+    if not results:
+        return dict(FALLBACK_TWEET_CONTENT)
+
+    if cache is not None:
+        cache.add(cache_key, results[0])
+    return results[0]
+
+
+def generate_tweet_variants(title: str, bullets: List[str], n: int = 3, max_retries: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Up to n distinct candidates (same shape as generate_tweet_content) from one
+    call with the `n` parameter, so the prompt is sent and billed once. Invalid
+    or duplicate choices are dropped, so fewer than n may come back; on total
+    failure the list holds only the fallback content. Always calls the model;
+    the candidates are added to the generation cache when it is enabled.
+    """
+    pool = get_deployment_pool()
+    with metrics.stage("prompt_build"):
+        hashtags = tweet_hashtags(title, bullets)
+        system_prompt, user_prompt = build_tweet_prompts(title, bullets, description_only=bool(hashtags))
+
+    results = _request_tweet_contents(pool, system_prompt, user_prompt, n=max(1, n), max_retries=max_retries, hashtags=hashtags)
+    if not results:
+        return [dict(FALLBACK_TWEET_CONTENT)]
+
+    cache = get_generation_cache()
+    if cache is not None:
+        cache_key = generation_cache_key(pool.name, system_prompt, user_prompt, _response_schema(bool(hashtags)), TWEET_TEMPERATURE)
+        for result in results:
+            cache.add(cache_key, result)
+    return results
+
+
+def _partial_json_string(raw: str, key: str) -> Optional[str]:
+    """
+    Decoded (possibly unfinished) string value of `key` in a JSON document that
+    is still being streamed. None until the value has started.
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), raw)
+    if not match:
+        return None
+
+    out = []
+    i = match.end()
+    while i < len(raw):
+        ch = raw[i]
+        if ch == '"':
+            break
+        if ch == "\\":
+            if i + 1 >= len(raw):
+                break  # escape split across chunks
+            esc = raw[i + 1]
+            if esc == "u":
+                if i + 6 > len(raw):
+                    break
+                code = int(raw[i + 2:i + 6], 16)
+                if 0xD800 <= code <= 0xDBFF:
+                    # high surrogate (emoji etc.): emit only together with its low half
+                    following = raw[i + 6:i + 12]
+                    if len(following) < 6 and "\\u".startswith(following[:2]):
+                        break  # low half may not be streamed yet
+                    low = int(following[2:], 16) if following.startswith("\\u") else -1
+                    if 0xDC00 <= low <= 0xDFFF:
+                        out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                        continue
+                    code = 0xFFFD  # unpaired
+                elif 0xDC00 <= code <= 0xDFFF:
+                    code = 0xFFFD
+                out.append(chr(code))
+                i += 6
+                continue
+            out.append({"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}.get(esc, esc))
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def stream_tweet_content(title: str, bullets: List[str], use_cache: bool = True) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming variant of generate_tweet_content. Yields ("delta", str) pieces of
+    the description as the model writes them, then one ("result", dict) with the
+    validated content (same shape as generate_tweet_content). The deltas are the
+    raw model text; the final result may differ (e.g. 25-word truncation).
+    """
+    pool = get_deployment_pool()
+    with metrics.stage("prompt_build"):
+        hashtags = tweet_hashtags(title, bullets)
+        system_prompt, user_prompt = build_tweet_prompts(title, bullets, description_only=bool(hashtags))
+
+    cache, cache_key, cached = _cached_content(pool, system_prompt, user_prompt, use_cache, bool(hashtags))
+    if cached is not None:
+        yield "delta", cached["description"]
+        yield "result", cached
+        return
+
+    estimate = _estimate_tokens(system_prompt, user_prompt)
+    policy = llm_retry.get_retry_policy()
+    deadline_at = policy.start()
+    dep = _acquire(pool, estimate, policy, deadline_at)
+    if dep is None:
+        yield "result", dict(FALLBACK_TWEET_CONTENT)
+        return
+
+    raw = ""
+    sent = 0
+    used_tokens = 0
+    error = None
+    finished = False
+    stream = None
+    started = time.perf_counter()
+    try:
+        # the "azure_openai" slot is held while the stream is open, not for the fallback below
+        with get_admission_controller().hold(("azure_openai",)):
+            stream = dep.config.client.chat.completions.create(
+                **_chat_request_kwargs(dep.config.deployment, system_prompt, user_prompt, description_only=bool(hashtags)),
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=max(policy.remaining(deadline_at), 1.0),
+            )
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    metrics.record_usage(chunk.usage)
+                    used_tokens = _usage_tokens(chunk.usage)
+                if not chunk.choices:
+                    continue  # prompt filter results / final usage chunk
+                raw += chunk.choices[0].delta.content or ""
+                desc = _partial_json_string(raw, "description")
+                if desc is not None and len(desc) > sent:
+                    yield "delta", desc[sent:]
+                    sent = len(desc)
+
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_call")
+        finished = True
+        result = parse_tweet_content(raw, hashtags)
+        dep.breaker.record_success()
+        metrics.LLM_ATTEMPTS.inc(outcome="ok")
+        if cache is not None:
+            cache.add(cache_key, result)
+    except Rejected as e:
+        error = e
+        finished = True
+        pool.release(dep, estimate, sent=False)
+        dep.breaker.release()  # not sent: no verdict on the deployment
+        raise
+    except Exception as e:
+        error = e
+        finished = True
+        pool.release(dep, estimate, used_tokens, getattr(getattr(e, "response", None), "headers", None), e)
+        if not llm_retry.is_upstream_error(e):
+            dep.breaker.release()  # a bug here says nothing about the deployment
+            raise
+        dep.breaker.record(e)
+        metrics.LLM_ATTEMPTS.inc(outcome=llm_retry.classify(e))
+        logger.warning(f"Azure OpenAI streaming attempt failed: {e}")
+        # fall back to the regular (retrying) path unless retrying can't help
+        if llm_retry.classify(e) == llm_retry.FATAL:
+            result = dict(FALLBACK_TWEET_CONTENT)
+        else:
+            result = generate_tweet_content(title, bullets, use_cache=use_cache)
+    finally:
+        if not finished:
+            # the consumer stopped iterating mid-stream (GeneratorExit): no
+            # verdict on the deployment, but a probe must not stay taken
+            dep.breaker.release()
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+        if error is None:
+            pool.release(dep, estimate, used_tokens)
+
+    yield "result", result
 
 
 # =========================================================
 # Public function you will call from main.py
 # =========================================================
-def generate_post_text_for_asin(asin: str) -> str:
-    """
-    Returns the final tweet text string:
+_amazon_helper = None
 
-    <description>
-    <affiliate_url>
-    #amazon <tag1> <tag2>
-    """
-    asin = (asin or "").strip()
-    if not asin:
-        raise ValueError("ASIN is required")
 
+def _amazon_helper_from_env() -> AmazonApiHelper:
+    """
+    Long-lived AmazonApiHelper, so its signer's per-day key cache is reused
+    across calls. Rebuilt if the credentials in the environment change.
+    """
+    global _amazon_helper
     access = os.getenv("AMAZON_ACCESS_KEY")
     secret = os.getenv("AMAZON_SECRET_KEY")
     tag = os.getenv("AMAZON_ASSOC_TAG")
@@ -309,9 +828,21 @@ def generate_post_text_for_asin(asin: str) -> str:
     if not (access and secret and tag):
         raise RuntimeError("Missing Amazon PA-API env vars: AMAZON_ACCESS_KEY / AMAZON_SECRET_KEY / AMAZON_ASSOC_TAG")
 
-    amazon = AmazonApiHelper(access_key=access, secret_key=secret, associate_tag=tag)
+    helper = _amazon_helper
+    if helper is None or (helper.access_key, helper.secret_key, helper.associate_tag) != (access, secret, tag):
+        helper = AmazonApiHelper(
+            access_key=access,
+            secret_key=secret,
+            associate_tag=tag,
+            endpoint=os.getenv("AMAZON_API_ENDPOINT", "webservices.amazon.com"),
+            scheme=os.getenv("AMAZON_API_SCHEME", "https"),
+            cache=get_item_cache(),
+        )
+        _amazon_helper = helper
+    return helper
+
 
-    item = amazon.get_item_info(asin)
+def _post_text_from_item(asin: str, item: Dict[str, Any], use_cache: bool = True) -> str:
     title = item.get("title") or ""
     features = item.get("features") or []
     affiliate_url = item.get("url") or f"https://www.amazon.com/dp/{asin}"
@@ -319,8 +850,11 @@ def generate_post_text_for_asin(asin: str) -> str:
     if not title:
         raise RuntimeError(f"PA-API returned empty title for ASIN {asin}")
 
-    ai = generate_tweet_content(title, features)
+    ai = generate_tweet_content(title, features, use_cache=use_cache)
+    return format_post_text(ai, affiliate_url)
 
+
+def format_post_text(ai: Dict[str, Any], affiliate_url: str) -> str:
     # 3 tags: #amazon + 2 ai tags
     tags = ["#amazon"] + ai["hashtags"]
     tags_str = " ".join(tags)
@@ -329,6 +863,113 @@ def generate_post_text_for_asin(asin: str) -> str:
     return post_text
 
 
+def variant_count(value: Any) -> int:
+    """
+    Parses a requested variant count, clamped to 1..MAX_TWEET_VARIANTS.
+    Raises ValueError for non-integers.
+    """
+    try:
+        n = int(value or 1)
+    except (TypeError, ValueError):
+        raise ValueError("variants must be an integer")
+    return max(1, min(n, MAX_TWEET_VARIANTS))
+
+
+def generate_post_text_variants_for_asin(asin: str, n: int = 3) -> List[str]:
+    """
+    Like generate_post_text_for_asin, but returns up to n alternative post
+    texts generated in a single model call (see generate_tweet_variants).
+    """
+    asin = (asin or "").strip()
+    if not asin:
+        raise ValueError("ASIN is required")
+
+    amazon = _amazon_helper_from_env()
+
+    item = amazon.get_item_info(asin)
+    title = item.get("title") or ""
+    affiliate_url = item.get("url") or f"https://www.amazon.com/dp/{asin}"
+    if not title:
+        raise RuntimeError(f"PA-API returned empty title for ASIN {asin}")
+
+    variants = generate_tweet_variants(title, item.get("features") or [], n=n)
+    return [format_post_text(ai, affiliate_url) for ai in variants]
+
+
+def generate_post_text_for_asin(asin: str, use_cache: bool = True) -> str:
+    """
+    Returns the final tweet text string:
+
+    <description>
+    <affiliate_url>
+    #amazon <tag1> <tag2>
+
+    use_cache=False forces a new model call even if the generation cache has a hit.
+    """
+    asin = (asin or "").strip()
+    if not asin:
+        raise ValueError("ASIN is required")
+
+    amazon = _amazon_helper_from_env()
+
+    item = amazon.get_item_info(asin)
+    return _post_text_from_item(asin, item, use_cache=use_cache)
+
+
+def stream_post_text_for_asin(asin: str, use_cache: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming variant of generate_post_text_for_asin. Yields (event, data):
+
+        ("item",  {"asin", "title", "url"})   as soon as PA-API answers
+        ("delta", {"text"})                   description tokens from the model
+        ("done",  {"post_text"})              final validated post
+    """
+    asin = (asin or "").strip()
+    if not asin:
+        raise ValueError("ASIN is required")
+
+    amazon = _amazon_helper_from_env()
+
+    item = amazon.get_item_info(asin)
+    title = item.get("title") or ""
+    affiliate_url = item.get("url") or f"https://www.amazon.com/dp/{asin}"
+    if not title:
+        raise RuntimeError(f"PA-API returned empty title for ASIN {asin}")
+
+    yield "item", {"asin": asin, "title": title, "url": affiliate_url}
+
+    for kind, value in stream_tweet_content(title, item.get("features") or [], use_cache=use_cache):
+        if kind == "delta":
+            yield "delta", {"text": value}
+        else:
+            yield "done", {"post_text": format_post_text(value, affiliate_url)}
+
+
+def generate_post_texts_for_asins(asins: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Bulk variant of generate_post_text_for_asin. Item metadata is fetched with
+    batched GetItems calls (10 ASINs per request).
+
+    Returns a dict keyed by ASIN:
+        {"asin": "...", "ok": True, "post_text": "..."}
+        {"asin": "...", "ok": False, "error": "..."}
+    """
+    amazon = _amazon_helper_from_env()
+    items = amazon.get_items_info(asins)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for asin, item in items.items():
+        if item.get("error"):
+            results[asin] = {"asin": asin, "ok": False, "error": item["error"]}
+            continue
+        try:
+            results[asin] = {"asin": asin, "ok": True, "post_text": _post_text_from_item(asin, item)}
+        except Exception as e:
+            results[asin] = {"asin": asin, "ok": False, "error": str(e)}
+
+    return results
+
+
 # =========================================================
 # Local test
 # =========================================================
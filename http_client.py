@@ -0,0 +1,163 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib.parse import urlsplit
+
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger("http_client")
+
+# =========================================================
+# Configuration (env)
+# =========================================================
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # number of hosts kept pooled
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_MAX_RETRY_WAIT = float(os.getenv("HTTP_MAX_RETRY_WAIT", "30"))  # never sleep longer than this for one retry
+
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+# =========================================================
+# Shared session
+# =========================================================
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide requests.Session. The mounted adapter keeps one keep-alive
+    pool per host, so api.twitter.com and webservices.amazon.com connections
+    (and their TLS sessions) are reused across calls and threads.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+# =========================================================
+# Retry / backoff
+# =========================================================
+def _header_delay(resp: requests.Response) -> Optional[float]:
+    """
+    Seconds the server asked us to wait, from Retry-After (seconds or HTTP date)
+    or X's x-rate-limit-reset (epoch seconds). None if neither is present.
+    """
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    reset = resp.headers.get("x-rate-limit-reset")
+    if reset:
+        try:
+            return max(0.0, float(reset) - time.time())
+        except ValueError:
+            pass
+
+    return None
+
+
+def _backoff_delay(attempt: int) -> float:
+    # full jitter: uniform(0, base * 2^attempt)
+    return random.uniform(0, HTTP_BACKOFF_BASE * (2 ** attempt))
+
+
+def request(method: str, url: str, retries: Optional[int] = None, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+    """
+    session.request() with default timeouts and retries.
+
+    Idempotent requests (GET etc., or idempotent=True, e.g. PA-API GetItems)
+    are retried on 429/502/503/504 and connection errors. Other POSTs are
+    retried on 429 only: a 5xx from a gateway or a timeout may come after the
+    upstream already acted (tweet created, refresh token rotated), so those
+    are never sent twice.
+
+    The wait honours Retry-After / x-rate-limit-reset, falling back to jittered
+    exponential backoff. If the server asks for more than HTTP_MAX_RETRY_WAIT
+    seconds the response is returned as-is instead of blocking the caller.
+    """
+    retries = HTTP_MAX_RETRIES if retries is None else retries
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    session = get_session()
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    statuses = RETRY_STATUSES if idempotent else (429,)
+
+    attempt = 0
+    while True:
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not idempotent or attempt >= retries:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(f"{method} {url} failed ({e}); retrying in {delay:.2f}s")
+            metrics.HTTP_RETRIES.inc(host=urlsplit(url).netloc, status="error")
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        if resp.status_code not in statuses or attempt >= retries:
+            return resp
+
+        delay = _header_delay(resp)
+        if delay is None:
+            delay = _backoff_delay(attempt)
+        if delay > HTTP_MAX_RETRY_WAIT:
+            return resp
+
+        logger.warning(f"{method} {url} -> {resp.status_code}; retrying in {delay:.2f}s")
+        metrics.HTTP_RETRIES.inc(host=urlsplit(url).netloc, status=resp.status_code)
+        time.sleep(delay)
+        attempt += 1
+
+
+def never_sent(exc: BaseException) -> bool:
+    """
+    True when a request failed before any byte reached the server (connect
+    timeout, refused connection, DNS failure), so even a non-idempotent
+    request can safely be sent again.
+    """
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError):
+        reason = getattr(exc.args[0] if exc.args else None, "reason", None)
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
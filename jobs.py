@@ -0,0 +1,128 @@
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Hashable
+
+logger = logging.getLogger("jobs")
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class JobQueue:
+    """
+    Bounded background executor for slow generation work.
+
+    submit() returns a job id immediately; the work runs on one of `max_workers`
+    threads. Submitting a key that is already queued/running returns the existing
+    job id instead of starting a second one. Finished jobs are kept for
+    `result_ttl` seconds so clients can poll for them.
+
+    With `shared` (a key/value store such as cache.SqliteCache) every job
+    snapshot is also written there, so any worker process can answer a poll.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, result_ttl: float = 300, shared=None):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.shared = shared
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gen-job")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[Hashable, str] = {}
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] and now - job["finished_at"] > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._events.pop(job_id, None)
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> str:
+        with self._lock:
+            self._prune()
+
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                return job_id
+
+            if len(self._inflight) >= self.max_pending:
+                raise QueueFullError("Too many generation jobs in flight, try again shortly")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+            self._events[job_id] = threading.Event()
+            self._inflight[key] = job_id
+            self._publish(self._jobs[job_id])
+
+        self._executor.submit(self._run, job_id, key, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, key: Hashable, fn: Callable[..., Any], args, kwargs):
+        with self._lock:
+            self._jobs[job_id]["status"] = "running"
+            self._publish(self._jobs[job_id])
+
+        try:
+            result = fn(*args, **kwargs)
+            update = {"status": "done", "result": result}
+        except Exception as e:
+            logger.warning(f"Job {job_id} failed: {e}")
+            update = {"status": "error", "error": str(e)}
+
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(update)
+            job["finished_at"] = time.time()
+            self._inflight.pop(key, None)
+            self._publish(job)
+            event = self._events.get(job_id)
+        if event is not None:
+            event.set()
+
+    def get(self, job_id: str, wait: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        Returns a snapshot of the job, or None if unknown/expired.
+        wait > 0 blocks up to that many seconds for the job to finish (long poll).
+        """
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is not None and wait > 0:
+            event.wait(wait)
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+
+        if self.shared is not None:
+            # Job runs in another process: poll the shared snapshot instead.
+            deadline = time.time() + wait
+            while True:
+                job = self.shared.get(job_id)
+                if job is None or job["status"] in ("done", "error") or time.time() >= deadline:
+                    return job
+                time.sleep(0.25)
+        return None
+
+    def _publish(self, job: Dict[str, Any]):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(job["id"], job, ttl=self.result_ttl)
+        except Exception as e:
+            logger.warning(f"Could not publish job {job['id']}: {e}")
@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+KEYWORDS_FILE = os.getenv(
+    "KEYWORDS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_keywords.json")
+)
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+TITLE_WEIGHT = 3  # a keyword in the title counts as much as three in the features
+
+
+class KeywordIndex:
+    """
+    keyword -> category table indexed by normalised word sequence, so scanning
+    a title costs one dict lookup per word (per n-gram for multi-word
+    keywords) however large the table gets. Keywords match whole words,
+    case-insensitive, with simple plurals ("bags", "dresses").
+
+        index = KeywordIndex({"mouse": "tech", "desk lamp": "home"}, {"tech": ["#tech", "#gadgets"]})
+        index.categories("Wireless Mouse", ["..."])   -> ["tech"]
+        index.hashtags("Wireless Mouse", ["..."])     -> ["#tech", "#gadgets"]
+    """
+
+    def __init__(self, keywords: Dict[str, str], hashtags: Optional[Dict[str, List[str]]] = None,
+                 default_hashtags: Optional[List[str]] = None):
+        self.keywords = {" ".join(WORD_RE.findall(k.lower())): v for k, v in keywords.items()}
+        self.keywords.pop("", None)
+        self.category_hashtags = hashtags or {}
+        self.default_hashtags = default_hashtags or ["#home", "#lifestyle"]
+        self._max_words = max((k.count(" ") + 1 for k in self.keywords), default=0)
+
+    def _lookup(self, phrase: str) -> Optional[str]:
+        category = self.keywords.get(phrase)
+        if category is None and phrase.endswith("s"):
+            category = self.keywords.get(phrase[:-1])
+            if category is None and phrase.endswith("es"):
+                category = self.keywords.get(phrase[:-2])
+        return category
+
+    def _scan(self, text: str) -> List[str]:
+        """
+        Categories of the keywords found in text, in order; the longest
+        keyword starting at a word wins.
+        """
+        if not text or not self._max_words:
+            return []
+        words = WORD_RE.findall(text.lower())
+        if self._max_words == 1:
+            return [c for c in map(self._lookup, words) if c is not None]
+        found = []
+        i = 0
+        while i < len(words):
+            for n in range(min(self._max_words, len(words) - i), 0, -1):
+                category = self._lookup(" ".join(words[i:i + n]) if n > 1 else words[i])
+                if category is not None:
+                    found.append(category)
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordIndex":
+        """
+        Loads {"keywords": {kw: category}, "hashtags": {category: [tags]},
+        "default_hashtags": [tags]} (see category_keywords.json).
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("keywords") or {}, data.get("hashtags"), data.get("default_hashtags"))
+
+    def categories(self, title: str, features: Optional[List[str]] = None) -> List[str]:
+        """
+        Matched categories, best first: title hits weigh TITLE_WEIGHT, feature
+        hits 1; ties go to the category seen first in the title.
+        """
+        title_hits = self._scan(title or "")
+        if not features and len(set(title_hits)) == len(title_hits):
+            return title_hits  # common case: already ranked by first appearance
+        scores: Counter = Counter()
+        for category in title_hits:
+            scores[category] += TITLE_WEIGHT
+        for feature in features or []:
+            for category in self._scan(feature):
+                scores[category] += 1
+
+        first_seen = {c: i for i, c in reversed(list(enumerate(title_hits)))}
+        return sorted(scores, key=lambda c: (-scores[c], first_seen.get(c, len(title_hits))))
+
+    def category(self, title: str, features: Optional[List[str]] = None) -> str:
+        ranked = self.categories(title, features)
+        return ranked[0] if ranked else ""
+
+    def hashtags(self, title: str, features: Optional[List[str]] = None) -> List[str]:
+        """
+        Two distinct hashtags without an LLM: the best category's main tag, then
+        the runner-up category's main tag (or the best category's second tag).
+        """
+        candidates: List[str] = []
+        ranked = self.categories(title, features)
+        for category in ranked[:2]:
+            candidates.extend(self.category_hashtags.get(category, [f"#{category}"])[:1])
+        if ranked:
+            candidates.extend(self.category_hashtags.get(ranked[0], [])[1:])
+        candidates.extend(self.default_hashtags)
+
+        tags: List[str] = []
+        for tag in candidates:
+            tag = tag.strip().lower()
+            tag = tag if tag.startswith("#") else f"#{tag}"
+            if tag not in tags:
+                tags.append(tag)
+        return tags[:2]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_keyword_index() -> KeywordIndex:
+    """
+    Process-wide KeywordIndex loaded from KEYWORDS_FILE (default:
+    category_keywords.json next to this module).
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KeywordIndex.from_file(KEYWORDS_FILE)
+    return _index
@@ -0,0 +1,244 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger("llm_retry")
+
+# =========================================================
+# Configuration (env)
+# =========================================================
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_MAX_RETRY_WAIT = float(os.getenv("LLM_MAX_RETRY_WAIT", "8"))  # cap for one sleep, incl. retry-after
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "20"))  # total seconds one generation may spend
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # consecutive service failures
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# a probe that reports no outcome within this many seconds (e.g. its client went away) is given up
+LLM_BREAKER_PROBE_TIMEOUT = float(os.getenv("LLM_BREAKER_PROBE_TIMEOUT", str(LLM_DEADLINE + 10)))
+
+# error classes
+SERVICE = "service"  # timeouts, connection errors, 408/409/429/5xx: back off and retry
+INVALID = "invalid"  # unusable completion (bad JSON, missing fields): retry at once
+FATAL = "fatal"  # other 4xx (auth, bad request, content filter) and anything else: retrying won't help
+
+RETRY_STATUSES = (408, 409, 429)
+
+
+def classify(exc: BaseException) -> str:
+    # deferred; already loaded by the time a call has failed
+    import httpx
+    import openai
+
+    # httpx errors surface unwrapped while a stream is being read
+    if isinstance(exc, (openai.APIConnectionError, httpx.TransportError)):  # includes APITimeoutError
+        return SERVICE
+    if isinstance(exc, openai.APIStatusError):
+        status = exc.status_code
+        return SERVICE if status in RETRY_STATUSES or status >= 500 else FATAL
+    if isinstance(exc, (ValueError, openai.APIResponseValidationError)):
+        return INVALID
+    return FATAL
+
+
+def is_upstream_error(exc: BaseException) -> bool:
+    """
+    True for errors that describe the call or its completion. Anything else
+    (NameError, TypeError, ...) is a bug: callers re-raise it instead of
+    retrying it or hiding it behind fallback content.
+    """
+    import httpx
+    import openai
+
+    return isinstance(exc, (openai.APIError, httpx.HTTPError, ValueError))
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Seconds the service asked us to wait (retry-after-ms / retry-after), if any.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+# =========================================================
+# Retry policy
+# =========================================================
+class RetryPolicy:
+    """
+    Decides whether and how long to wait before the next attempt:
+      - FATAL errors are not retried,
+      - INVALID completions are retried without sleeping,
+      - SERVICE errors use retry-after if given, otherwise full-jitter
+        exponential backoff, capped by max_wait,
+      - nothing is retried past the per-request deadline.
+    """
+
+    def __init__(self, max_attempts: int = LLM_MAX_ATTEMPTS, backoff_base: float = LLM_BACKOFF_BASE,
+                 max_wait: float = LLM_MAX_RETRY_WAIT, deadline: float = LLM_DEADLINE):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.max_wait = max_wait
+        self.deadline = deadline
+
+    def start(self) -> float:
+        """
+        Absolute (monotonic) deadline for a request starting now.
+        """
+        return time.monotonic() + self.deadline
+
+    @staticmethod
+    def remaining(deadline_at: float) -> float:
+        return max(0.0, deadline_at - time.monotonic())
+
+    def next_delay(self, attempt: int, exc: BaseException, deadline_at: float, max_attempts: Optional[int] = None) -> Optional[float]:
+        """
+        Seconds to sleep before attempt+1, or None to give up now.
+        """
+        if attempt >= (max_attempts or self.max_attempts):
+            return None
+
+        kind = classify(exc)
+        if kind == FATAL:
+            return None
+        if kind == INVALID:
+            delay = 0.0
+        else:
+            delay = retry_after(exc)
+            if delay is None:
+                delay = random.uniform(0, self.backoff_base * (2 ** (attempt - 1)))
+            delay = min(delay, self.max_wait)
+
+        # leave at least a second for the next call itself
+        if delay + 1.0 > self.remaining(deadline_at):
+            return None
+        return delay
+
+
+# =========================================================
+# Circuit breaker
+# =========================================================
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker shared by all requests of one deployment in
+    this process. After `threshold` SERVICE failures in a row it opens for
+    `cooldown` seconds (allow() returns False); then a single probe request is
+    let through and its outcome closes or re-opens the breaker. A probe that
+    ends without an outcome calls release(); one that never reports back is
+    replaced by a new probe after `probe_timeout` seconds.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN,
+                 probe_timeout: float = LLM_BREAKER_PROBE_TIMEOUT):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        if self.threshold <= 0:
+            return True
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self._state == self.OPEN and now - self._opened_at >= self.cooldown:
+                self._state = self.HALF_OPEN  # this caller is the probe
+                self._probe_started = now
+                return True
+            if self._state == self.HALF_OPEN and now - self._probe_started >= self.probe_timeout:
+                logger.warning(f"Circuit '{self.name}': probe gave no outcome in {self.probe_timeout:.0f}s, probing again")
+                self._probe_started = now
+                return True
+            return False
+
+    def release(self):
+        """
+        Neutral outcome: the call ended without telling whether the deployment
+        is healthy (e.g. the consumer stopped reading). A pending probe is
+        handed back, so the next caller probes instead.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic() - self.cooldown
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and 0 < self.threshold <= self._failures):
+                logger.warning(f"Circuit '{self.name}' open for {self.cooldown:.0f}s after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record(self, exc: BaseException):
+        """
+        Only SERVICE errors count against the deployment; any other outcome
+        means it answered.
+        """
+        if classify(exc) == SERVICE:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+_policy = None
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_retry_policy() -> RetryPolicy:
+    global _policy
+    if _policy is None:
+        _policy = RetryPolicy()
+    return _policy
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
@@ -0,0 +1,189 @@
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+# =========================================================
+# Minimal Prometheus-style metrics (text exposition format 0.0.4)
+# =========================================================
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, row):
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, (('le', str(bound)),))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, (('le', '+Inf'),))} {row[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {row[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], List[str]]):
+        """
+        fn() returns already formatted exposition lines (for values computed at
+        scrape time, e.g. cache stats).
+        """
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            try:
+                lines.extend(fn())
+            except Exception:
+                logging.getLogger("metrics").exception("metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "azp_stage_seconds",
+    "Latency of pipeline stages and external calls (paapi_fetch, prompt_build, llm_call, retry_sleep, token_refresh, tweet_post).",
+    ("stage",),
+))
+LLM_ATTEMPTS = REGISTRY.register(Counter(
+    "azp_llm_attempts_total", "Azure OpenAI chat-completion attempts.", ("outcome",),
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "azp_llm_tokens_total", "Tokens reported in resp.usage.", ("kind",),
+))
+LLM_ROUTED = REGISTRY.register(Counter(
+    "azp_llm_routed_total", "Chat completions routed per Azure OpenAI deployment.", ("deployment",),
+))
+HTTP_RETRIES = REGISTRY.register(Counter(
+    "azp_upstream_retries_total", "Upstream HTTP retries by host and status.", ("host", "status"),
+))
+POST_HISTORY_HITS = REGISTRY.register(Counter(
+    "azp_post_history_hits_total", "Calls skipped thanks to the posting history.", ("kind",),
+))
+ROUTE_SECONDS = REGISTRY.register(Histogram(
+    "azp_http_request_seconds", "Flask request latency by route.", ("route", "method", "status"),
+))
+
+
+def record_usage(usage: Any):
+    """
+    Adds prompt/completion token counts from an OpenAI `usage` object.
+    """
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+
+def stage(name: str):
+    return STAGE_SECONDS.time(stage=name)
+
+
+# =========================================================
+# Trace IDs
+# =========================================================
+_trace_id: contextvars.ContextVar = contextvars.ContextVar("trace_id", default="-")
+
+
+def new_trace_id(value: Optional[str] = None) -> str:
+    trace_id = (value or "").strip()[:64] or uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def current_trace_id() -> str:
+    return _trace_id.get()
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get()
+        return True
+
+
+def install_trace_logging(fmt: str = "%(levelname)s:%(name)s:[%(trace_id)s] %(message)s"):
+    """
+    Adds the current trace id to every log line written by the root handlers.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=logging.INFO)
+    for handler in root.handlers:
+        handler.addFilter(TraceIdFilter())
+        handler.setFormatter(logging.Formatter(fmt))
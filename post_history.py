@@ -0,0 +1,292 @@
+import os
+import re
+import time
+import struct
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger("post_history")
+
+POST_HISTORY_DB = os.getenv("POST_HISTORY_DB", "post_history.db")
+POST_HISTORY_ENABLED = os.getenv("POST_HISTORY_ENABLED", "1").lower() in ("1", "true", "yes")
+POST_HISTORY_WINDOW_DAYS = float(os.getenv("POST_HISTORY_WINDOW_DAYS", "30"))  # look-back for duplicates
+POST_HISTORY_MIN_SIMILARITY = float(os.getenv("POST_HISTORY_MIN_SIMILARITY", "0.7"))  # estimated Jaccard
+
+# 32 MinHash values = 8 LSH bands of 4: texts at 0.7 similarity share a band
+# ~90% of the time, at 0.85 (one word changed in a tweet) >99%, unrelated ~never
+MINHASH_BANDS = 8
+MINHASH_ROWS = 4
+MINHASH_SIZE = MINHASH_BANDS * MINHASH_ROWS
+_SIGNATURE_FORMAT = f">{MINHASH_SIZE}I"
+
+URL_RE = re.compile(r"https?://\S+")
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+ASIN_RE = re.compile(r"/(?:dp|gp/product)/([A-Z0-9]{10})")
+
+Signature = Tuple[int, ...]
+
+
+# =========================================================
+# Fingerprints
+# =========================================================
+def shingles(text: str) -> Set[str]:
+    """
+    Word bigrams of the text without its links, case-insensitive (the single
+    word for one-word texts).
+    """
+    words = TOKEN_RE.findall(URL_RE.sub(" ", text or "").lower())
+    return {" ".join(words[i:i + 2]) for i in range(len(words) - 1)} or set(words)
+
+
+def minhash(text: str) -> Signature:
+    """
+    MINHASH_SIZE-value MinHash signature of the text's shingles; the share of
+    equal positions between two signatures estimates their Jaccard similarity.
+    """
+    # one SHAKE-128 digest per shingle gives all MINHASH_SIZE 32-bit hash functions at once
+    rows = [
+        struct.unpack(_SIGNATURE_FORMAT, hashlib.shake_128(s.encode("utf-8")).digest(4 * MINHASH_SIZE))
+        for s in shingles(text)
+    ]
+    if not rows:
+        return (0xFFFFFFFF,) * MINHASH_SIZE
+    return tuple(map(min, zip(*rows)))
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_SIZE
+
+
+def _pack(signature: Signature) -> bytes:
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def _unpack(blob: bytes) -> Signature:
+    return struct.unpack(_SIGNATURE_FORMAT, blob)
+
+
+def asin_from_text(text: str) -> Optional[str]:
+    """
+    ASIN of the Amazon link in a post text (format_post_text puts one at the end).
+    """
+    match = ASIN_RE.search(text or "")
+    return match.group(1) if match else None
+
+
+# =========================================================
+# History
+# =========================================================
+class PostHistory:
+    """
+    SQLite record of generated and posted texts, indexed by (account, ASIN,
+    MinHash fingerprint).
+
+    Posted texts are also kept in an in-memory LSH index: each signature is
+    cut into MINHASH_BANDS bands and a text is only compared with the posts of
+    the same account that share at least one band with it. A near-duplicate
+    check is a few dict lookups plus a similarity per candidate, and does not
+    grow with the size of the history. Rows written by other worker processes
+    are picked up incrementally (by id) before each check.
+
+        history = PostHistory()
+        history.find_duplicate("123", text)       -> previous post or None
+        history.record_posted("123", text)
+        history.unposted_text("B0...", "123")     -> earlier generated text not yet posted there
+    """
+
+    def __init__(self, path: str = POST_HISTORY_DB, window_days: float = POST_HISTORY_WINDOW_DAYS,
+                 min_similarity: float = POST_HISTORY_MIN_SIMILARITY):
+        self.path = path
+        self.window = window_days * 86400
+        self.min_similarity = min_similarity
+
+        # (account, band no, band values) -> row ids; row id -> (account, asin, signature, posted_at)
+        self._bands: Dict[Tuple[str, int, Signature], Set[int]] = {}
+        self._posts: Dict[int, Tuple[str, Optional[str], Signature, float]] = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS post_history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT NOT NULL DEFAULT '', asin TEXT, "
+                "text TEXT NOT NULL, fingerprint BLOB NOT NULL, status TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS post_history_asin ON post_history(asin, status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS post_history_account ON post_history(account, asin, status)")
+            if self.window > 0:
+                conn.execute("DELETE FROM post_history WHERE created_at < ?", (time.time() - self.window,))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        # _sync runs on every check; opening a connection each time would cost more than the lookup
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _cutoff(self) -> float:
+        return time.time() - self.window if self.window > 0 else 0
+
+    # ---------------- LSH index ----------------
+    @staticmethod
+    def _band_keys(account: str, signature: Signature) -> List[Tuple[str, int, Signature]]:
+        return [(account, i, signature[i * MINHASH_ROWS:(i + 1) * MINHASH_ROWS]) for i in range(MINHASH_BANDS)]
+
+    def _index(self, row_id: int, account: str, asin: Optional[str], signature: Signature, posted_at: float):
+        self._posts[row_id] = (account, asin, signature, posted_at)
+        for key in self._band_keys(account, signature):
+            self._bands.setdefault(key, set()).add(row_id)
+
+    def _unindex(self, row_id: int):
+        account, _, signature, _ = self._posts.pop(row_id)
+        for key in self._band_keys(account, signature):
+            ids = self._bands.get(key)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del self._bands[key]
+
+    def _sync(self):
+        """
+        Adds posts written since the last sync (by any process) and drops the
+        ones that fell out of the look-back window.
+        """
+        cutoff = self._cutoff()
+        rows = self._reader().execute(
+            "SELECT id, account, asin, fingerprint, status, created_at FROM post_history "
+            "WHERE id > ? AND created_at >= ? ORDER BY id",
+            (self._last_id, cutoff),
+        ).fetchall()
+        with self._lock:
+            for r in rows:
+                if r["status"] == "posted" and r["id"] not in self._posts:
+                    self._index(r["id"], r["account"], r["asin"], _unpack(r["fingerprint"]), r["created_at"])
+            if rows:
+                self._last_id = max(self._last_id, rows[-1]["id"])
+            if cutoff:
+                # _posts is in (roughly) posting order, so expired entries are at the front
+                expired = []
+                for row_id, post in self._posts.items():
+                    if post[3] >= cutoff:
+                        break
+                    expired.append(row_id)
+                for row_id in expired:
+                    self._unindex(row_id)
+
+    # ---------------- public API ----------------
+    def find_duplicate(self, account: str, text: str, asin: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        The most similar text posted on `account` within the look-back window
+        with an estimated similarity of at least min_similarity, as
+        {"id", "asin", "similarity", "posted_at"}; None if there is none.
+        `asin` only narrows the match when both posts have one.
+        """
+        signature = minhash(text)
+        asin = asin or asin_from_text(text)
+        self._sync()
+
+        cutoff = self._cutoff()
+        best = None
+        with self._lock:
+            candidates: Set[int] = set()
+            for key in self._band_keys(account, signature):
+                candidates |= self._bands.get(key, set())
+            for row_id in candidates:
+                _, post_asin, post_signature, posted_at = self._posts[row_id]
+                if posted_at < cutoff or (asin and post_asin and asin != post_asin):
+                    continue
+                score = similarity(signature, post_signature)
+                if score >= self.min_similarity and (best is None or score > best["similarity"]):
+                    best = {"id": row_id, "asin": post_asin, "similarity": score, "posted_at": posted_at}
+        return best
+
+    def last_posted(self, account: str, asin: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recent post of `asin` on `account` within the look-back window.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, text, created_at FROM post_history WHERE account = ? AND asin = ? AND status = 'posted' "
+                "AND created_at >= ? ORDER BY id DESC LIMIT 1",
+                (account, asin, self._cutoff()),
+            ).fetchone()
+        return {"id": row["id"], "text": row["text"], "posted_at": row["created_at"]} if row else None
+
+    def unposted_text(self, asin: str, account: Optional[str] = None) -> Optional[str]:
+        """
+        Newest text generated for `asin` within the window that has not been
+        posted (on `account`, or on any account when it is None).
+        """
+        with self._connect() as conn:
+            generated = conn.execute(
+                "SELECT text, fingerprint FROM post_history WHERE asin = ? AND status = 'generated' "
+                "AND created_at >= ? ORDER BY id DESC LIMIT 20",
+                (asin, self._cutoff()),
+            ).fetchall()
+            if not generated:
+                return None
+            query = "SELECT fingerprint FROM post_history WHERE asin = ? AND status = 'posted' AND created_at >= ?"
+            params: tuple = (asin, self._cutoff())
+            if account is not None:
+                query += " AND account = ?"
+                params += (account,)
+            posted = [_unpack(r["fingerprint"]) for r in conn.execute(query, params)]
+
+        for row in generated:
+            signature = _unpack(row["fingerprint"])
+            if all(similarity(signature, p) < self.min_similarity for p in posted):
+                return row["text"]
+        return None
+
+    def record_generated(self, asin: str, texts: List[str]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO post_history (asin, text, fingerprint, status, created_at) VALUES (?, ?, ?, 'generated', ?)",
+                [(asin, t, _pack(minhash(t)), now) for t in texts if t],
+            )
+
+    def record_posted(self, account: str, text: str, asin: Optional[str] = None) -> int:
+        now = time.time()
+        asin = asin or asin_from_text(text)
+        signature = minhash(text)
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO post_history (account, asin, text, fingerprint, status, created_at) VALUES (?, ?, ?, ?, 'posted', ?)",
+                (account, asin, text, _pack(signature), now),
+            )
+        with self._lock:
+            self._index(cur.lastrowid, account, asin, signature, now)
+        return cur.lastrowid
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"indexed_posts": len(self._posts), "bands": len(self._bands)}
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_post_history() -> Optional[PostHistory]:
+    """
+    Process-wide PostHistory, or None when POST_HISTORY_ENABLED is off.
+    """
+    global _history
+    if not POST_HISTORY_ENABLED:
+        return None
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = PostHistory()
+    return _history
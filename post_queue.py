@@ -0,0 +1,281 @@
+import os
+import time
+import random
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger("post_queue")
+
+POST_QUEUE_DB = os.getenv("POST_QUEUE_DB", "post_queue.db")
+POST_QUEUE_WORKERS = int(os.getenv("POST_QUEUE_WORKERS", "4"))  # accounts sending in parallel
+POST_QUEUE_MAX_ATTEMPTS = int(os.getenv("POST_QUEUE_MAX_ATTEMPTS", "5"))
+POST_QUEUE_RETRY_BASE = float(os.getenv("POST_QUEUE_RETRY_BASE", "30"))  # seconds, doubled per attempt
+POST_QUEUE_MIN_INTERVAL = float(os.getenv("POST_QUEUE_MIN_INTERVAL", "0"))  # seconds between posts per account
+POST_QUEUE_POLL_INTERVAL = 1.0
+POST_QUEUE_STALE_SENDING = 300  # a "sending" row older than this is assumed orphaned by a crash
+
+# send(user_id, text) -> response with .status_code, .headers, .text
+SendFn = Callable[[str, str], Any]
+
+
+class NotSent(RuntimeError):
+    """
+    Raised by a send function when the post certainly never reached X (e.g.
+    token refresh failed, connection refused); the item is retried.
+    """
+
+
+class PostQueue:
+    """
+    Persistent (SQLite) queue of tweets to post, drained by a scheduler thread.
+
+    - Posts for one account go out strictly in queue order, one at a time.
+    - Different accounts are sent in parallel on a small worker pool.
+    - Each account's x-rate-limit-remaining / x-rate-limit-reset headers are
+      tracked and the remaining budget is spread over the window, so sends are
+      paced instead of running into 429s.
+    - 429s are requeued and NotSent errors retried with backoff; other 4xx
+      responses (e.g. duplicate content) fail the item permanently.
+    - A 5xx or any other send error may come after X created the tweet, so
+      the item is marked 'unknown' instead of being sent a second time.
+    """
+
+    def __init__(self, send: SendFn, path: str = POST_QUEUE_DB, workers: int = POST_QUEUE_WORKERS):
+        self.send = send
+        self.path = path
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="post-queue")
+        self._busy: set = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS post_queue ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, text TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                "not_before REAL NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+                "last_error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS post_queue_due ON post_queue(status, user_id, id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS post_rate_limits ("
+                "user_id TEXT PRIMARY KEY, remaining INTEGER, reset_at REAL, "
+                "blocked_until REAL NOT NULL DEFAULT 0, last_sent_at REAL NOT NULL DEFAULT 0)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ---------------- public API ----------------
+    def enqueue(self, user_id: str, text: str, not_before: Optional[float] = None) -> int:
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO post_queue (user_id, text, not_before, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, text, not_before or now, now, now),
+            )
+        self._wakeup.set()
+        return cur.lastrowid
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM post_queue"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY id DESC LIMIT ?"
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(query, params + (limit,))]
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            return {r["status"]: r["n"] for r in conn.execute("SELECT status, COUNT(*) AS n FROM post_queue GROUP BY status")}
+
+    def rate_limits(self) -> Dict[str, Dict[str, Any]]:
+        with self._connect() as conn:
+            return {r["user_id"]: dict(r) for r in conn.execute("SELECT * FROM post_rate_limits")}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._requeue_stale()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="post-queue-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    # ---------------- scheduler ----------------
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self._dispatch_due()
+            except Exception as e:
+                logger.warning(f"Post queue dispatch failed: {e}")
+            self._wakeup.wait(POST_QUEUE_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def _requeue_stale(self):
+        # A 'sending' row blocks its account in every process, so one orphaned by a crash must not stay
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE post_queue SET status = 'pending', updated_at = ? WHERE status = 'sending' AND updated_at < ?",
+                (time.time(), time.time() - POST_QUEUE_STALE_SENDING),
+            )
+
+    def _dispatch_due(self):
+        self._requeue_stale()
+        now = time.time()
+        with self._connect() as conn:
+            # Oldest pending item per account; the account only moves when its head is due.
+            # Accounts with a post in flight (in any process sharing the DB) are skipped.
+            heads = conn.execute(
+                "SELECT q.* FROM post_queue q "
+                "JOIN (SELECT user_id, MIN(id) AS id FROM post_queue WHERE status = 'pending' GROUP BY user_id) h "
+                "ON q.id = h.id "
+                "WHERE NOT EXISTS (SELECT 1 FROM post_queue s WHERE s.user_id = q.user_id AND s.status = 'sending')"
+            ).fetchall()
+            limits = {r["user_id"]: r for r in conn.execute("SELECT * FROM post_rate_limits")}
+
+        for item in heads:
+            user_id = item["user_id"]
+            if item["not_before"] > now or self._next_send_at(limits.get(user_id), now) > now:
+                continue
+            with self._lock:
+                if user_id in self._busy:
+                    continue
+                self._busy.add(user_id)
+            if not self._claim(item["id"], user_id):
+                with self._lock:
+                    self._busy.discard(user_id)
+                continue
+            self._pool.submit(self._send_item, dict(item))
+
+    @staticmethod
+    def _next_send_at(limit: Optional[sqlite3.Row], now: float) -> float:
+        if limit is None:
+            return 0
+        next_at = max(limit["blocked_until"], limit["last_sent_at"] + POST_QUEUE_MIN_INTERVAL)
+        remaining, reset_at = limit["remaining"], limit["reset_at"]
+        if remaining is not None and reset_at and reset_at > now:
+            if remaining <= 0:
+                next_at = max(next_at, reset_at)
+            else:
+                # spread what is left of the window evenly over the remaining budget
+                next_at = max(next_at, limit["last_sent_at"] + (reset_at - limit["last_sent_at"]) / (remaining + 1))
+        return next_at
+
+    def _claim(self, item_id: int, user_id: str) -> bool:
+        # The status guards make the claim safe across processes sharing the DB:
+        # SQLite serialises writers, so only one process can move an account's
+        # head to 'sending', and none while another post of that account is in flight.
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE post_queue SET status = 'sending', updated_at = ? WHERE id = ? AND status = 'pending' "
+                "AND NOT EXISTS (SELECT 1 FROM post_queue WHERE user_id = ? AND status = 'sending')",
+                (time.time(), item_id, user_id),
+            )
+            if cur.rowcount != 1:
+                return False
+            # Pacing is re-checked under the write lock: another process may have
+            # sent for this account since the heads were read.
+            limit = conn.execute("SELECT * FROM post_rate_limits WHERE user_id = ?", (user_id,)).fetchone()
+            if self._next_send_at(limit, time.time()) > time.time():
+                conn.rollback()
+                return False
+            return True
+
+    def _send_item(self, item: Dict[str, Any]):
+        user_id = item["user_id"]
+        try:
+            try:
+                resp = self.send(user_id, item["text"])
+            except NotSent as e:
+                self._retry(item, str(e))
+                return
+            except Exception as e:
+                self._unknown(item, str(e))
+                return
+
+            self._record_rate_limit(user_id, resp)
+
+            if resp.status_code in (200, 201):
+                self._finish(item["id"], "sent", None)
+            elif resp.status_code == 429:
+                # not the item's fault: requeue without spending an attempt
+                self._update(item["id"], status="pending", last_error=f"429 {resp.text}")
+            elif resp.status_code >= 500:
+                self._unknown(item, f"{resp.status_code} {resp.text}")
+            else:
+                self._finish(item["id"], "failed", f"{resp.status_code} {resp.text}")
+        finally:
+            with self._lock:
+                self._busy.discard(user_id)
+            self._wakeup.set()
+
+    def _retry(self, item: Dict[str, Any], error: str):
+        attempts = item["attempts"] + 1
+        if attempts >= POST_QUEUE_MAX_ATTEMPTS:
+            self._finish(item["id"], "failed", error, attempts=attempts)
+            return
+        delay = POST_QUEUE_RETRY_BASE * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        logger.warning(f"Post {item['id']} attempt {attempts} failed: {error}; retrying in {delay:.0f}s")
+        self._update(item["id"], status="pending", attempts=attempts, not_before=time.time() + delay, last_error=error)
+
+    def _unknown(self, item: Dict[str, Any], error: str):
+        # A retry would either post twice or come back as a 403 duplicate; check the account instead
+        logger.warning(f"Post {item['id']} outcome unknown ({error}); not resending")
+        self._finish(item["id"], "unknown", error, attempts=item["attempts"] + 1)
+
+    def _finish(self, item_id: int, status: str, error: Optional[str], attempts: Optional[int] = None):
+        fields = {"status": status, "last_error": error}
+        if attempts is not None:
+            fields["attempts"] = attempts
+        self._update(item_id, **fields)
+
+    def _update(self, item_id: int, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE post_queue SET {assignments} WHERE id = ?", (*fields.values(), item_id))
+
+    def _record_rate_limit(self, user_id: str, resp: Any):
+        now = time.time()
+        headers = resp.headers or {}
+        remaining = headers.get("x-rate-limit-remaining")
+        reset = headers.get("x-rate-limit-reset")
+        blocked_until = 0.0
+        if resp.status_code == 429:
+            retry_after = headers.get("Retry-After")
+            if reset:
+                blocked_until = float(reset)
+            elif retry_after and retry_after.isdigit():
+                blocked_until = now + float(retry_after)
+            else:
+                blocked_until = now + 60
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO post_rate_limits (user_id, remaining, reset_at, blocked_until, last_sent_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET "
+                "remaining = COALESCE(excluded.remaining, remaining), "
+                "reset_at = COALESCE(excluded.reset_at, reset_at), "
+                "blocked_until = excluded.blocked_until, last_sent_at = excluded.last_sent_at",
+                (
+                    user_id,
+                    int(remaining) if remaining is not None else None,
+                    float(reset) if reset is not None else None,
+                    blocked_until,
+                    now,
+                ),
+            )
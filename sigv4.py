@@ -0,0 +1,67 @@
+import hmac
+import hashlib
+from typing import Tuple
+
+
+class SigV4Signer:
+    """
+    AWS Signature V4 signer for one fixed (host, path, region, service).
+
+    The derived signing key (four chained HMACs) only depends on the UTC date,
+    so it is cached per datestamp. The constant parts of the canonical request,
+    credential scope and Authorization header are built once in __init__.
+    Thread-safe; meant to be long-lived.
+    """
+
+    ALGORITHM = "AWS4-HMAC-SHA256"
+    SIGNED_HEADERS = "content-encoding;host;x-amz-date"
+
+    def __init__(self, access_key: str, secret_key: str, region: str, service: str, host: str, canonical_uri: str):
+        self.access_key = access_key
+        self.region = region
+        self.service = service
+        self._secret = ("AWS4" + secret_key).encode("utf-8")
+
+        # method \n uri \n querystring \n headers (up to x-amz-date value)
+        self._canonical_prefix = (
+            f"POST\n{canonical_uri}\n\n"
+            f"content-encoding:amz-1.0\n"
+            f"host:{host}\n"
+            f"x-amz-date:"
+        )
+        self._canonical_suffix = f"\n\n{self.SIGNED_HEADERS}\n"
+        self._scope_suffix = f"/{region}/{service}/aws4_request"
+        self._auth_prefix = f"{self.ALGORITHM} Credential={access_key}/"
+        self._auth_middle = f", SignedHeaders={self.SIGNED_HEADERS}, Signature="
+
+        # (datestamp, key); replaced as one tuple so readers never see a torn pair
+        self._key: Tuple[str, bytes] = ("", b"")
+
+    def signing_key(self, datestamp: str) -> bytes:
+        cached_date, key = self._key
+        if cached_date == datestamp:
+            return key
+
+        k_date = hmac.new(self._secret, datestamp.encode("utf-8"), hashlib.sha256).digest()
+        k_region = hmac.new(k_date, self.region.encode("utf-8"), hashlib.sha256).digest()
+        k_service = hmac.new(k_region, self.service.encode("utf-8"), hashlib.sha256).digest()
+        key = hmac.new(k_service, b"aws4_request", hashlib.sha256).digest()
+
+        self._key = (datestamp, key)
+        return key
+
+    def authorization(self, amz_date: str, datestamp: str, payload: str) -> str:
+        """
+        Authorization header value for a POST of `payload` signed at amz_date.
+        """
+        payload_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        canonical_request = f"{self._canonical_prefix}{amz_date}{self._canonical_suffix}{payload_hash}"
+
+        credential_scope = datestamp + self._scope_suffix
+        string_to_sign = (
+            f"{self.ALGORITHM}\n{amz_date}\n{credential_scope}\n"
+            f"{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
+        )
+
+        signature = hmac.new(self.signing_key(datestamp), string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        return f"{self._auth_prefix}{credential_scope}{self._auth_middle}{signature}"
@@ -0,0 +1,157 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable
+
+from token_store import TokenStore
+
+logger = logging.getLogger("token_refresh")
+
+TOKEN_REFRESH_MARGIN = 60  # refresh inline when the token expires within this many seconds
+TOKEN_REFRESH_LEAD = float(os.getenv("TOKEN_REFRESH_LEAD", "300"))  # background refresh window
+TOKEN_REFRESH_INTERVAL = float(os.getenv("TOKEN_REFRESH_INTERVAL", "30"))
+# upper bound for one refresh_fn call (connect + read, no retries); the lease must outlast it, or a
+# second worker could claim the account mid-refresh and send the same (rotating) refresh token
+TOKEN_REFRESH_TIMEOUT = float(os.getenv("TOKEN_REFRESH_TIMEOUT", "15"))
+TOKEN_REFRESH_LEASE = 2 * TOKEN_REFRESH_TIMEOUT + 10  # seconds one worker may hold an account's refresh
+
+# refresh_fn(refresh_token) -> token endpoint JSON ({"access_token", "refresh_token", "expires_in"});
+# must give up within TOKEN_REFRESH_TIMEOUT seconds
+RefreshFn = Callable[[str], Dict[str, Any]]
+
+
+def needs_refresh(user: Dict[str, Any], margin: float) -> bool:
+    access_token = user.get("access_token")
+    expires_in = int(user.get("expires_in") or 0)
+    obtained_at = int(user.get("obtained_at") or 0)
+    if access_token and expires_in and obtained_at:
+        return time.time() >= obtained_at + expires_in - margin
+    return True
+
+
+class TokenRefreshManager:
+    """
+    Single-flight OAuth token refresh.
+
+    X rotates refresh tokens, so two concurrent refreshes for one account leave
+    one of them holding a dead token. Here at most one refresh per account runs
+    at a time: threads in this process queue on a per-account lock, and other
+    processes are kept out by a short lease stored on the account row. Whoever
+    waits re-reads the row afterwards and picks up the new token.
+
+    start() runs a background thread that refreshes tokens TOKEN_REFRESH_LEAD
+    seconds before expiry, so the posting path normally finds a valid token.
+    """
+
+    def __init__(self, store: TokenStore, refresh_fn: RefreshFn):
+        self.store = store
+        self.refresh_fn = refresh_fn
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def ensure_fresh(self, user_id: str, margin: float = TOKEN_REFRESH_MARGIN) -> Dict[str, Any]:
+        """
+        Returns the account row, refreshing the access token first if it expires
+        within `margin` seconds.
+        """
+        user = self.store.get(user_id)
+        if not user:
+            raise RuntimeError("Unknown user")
+        if not needs_refresh(user, margin):
+            return user
+
+        with self._user_lock(user_id):
+            lease = uuid.uuid4().hex
+            deadline = time.time() + 2 * TOKEN_REFRESH_LEASE
+
+            def claim(current):
+                if current is None or not needs_refresh(current, margin) or not current.get("refresh_token"):
+                    return None
+                if (current.get("refresh_lease_until") or 0) > time.time():
+                    return None  # another process is refreshing
+                return dict(current, refresh_lease=lease, refresh_lease_until=time.time() + TOKEN_REFRESH_LEASE)
+
+            while True:
+                user = self.store.update(user_id, claim)
+                if not user:
+                    raise RuntimeError("Unknown user")
+                if not needs_refresh(user, margin):
+                    return user  # someone else refreshed it while we waited
+                if not user.get("refresh_token"):
+                    # Can't refresh; user must login again
+                    raise RuntimeError("No refresh_token. Please /login again and approve offline.access scope.")
+                if user.get("refresh_lease") == lease:
+                    break
+                if time.time() > deadline:
+                    raise RuntimeError("Timed out waiting for another worker to refresh the token")
+                time.sleep(0.2)
+
+            started = time.time()
+            try:
+                new_data = self.refresh_fn(user["refresh_token"])
+            except Exception:
+                self.store.update(user_id, self._release(lease))
+                raise
+            if time.time() - started > TOKEN_REFRESH_LEASE:
+                logger.warning(f"Token refresh for {user_id} outlasted its {TOKEN_REFRESH_LEASE:.0f}s lease")
+
+            def apply(current):
+                current = dict(current or user)
+                current["access_token"] = new_data.get("access_token", current.get("access_token"))
+                current["expires_in"] = new_data.get("expires_in", current.get("expires_in", 0))
+                current["obtained_at"] = int(time.time())
+                # refresh token may rotate
+                if new_data.get("refresh_token"):
+                    current["refresh_token"] = new_data["refresh_token"]
+                current.pop("refresh_lease", None)
+                current.pop("refresh_lease_until", None)
+                return current
+
+            return self.store.update(user_id, apply)
+
+    @staticmethod
+    def _release(lease: str):
+        def release(current):
+            if not current or current.get("refresh_lease") != lease:
+                return None
+            current = dict(current)
+            current.pop("refresh_lease", None)
+            current.pop("refresh_lease_until", None)
+            return current
+        return release
+
+    # ---------------- background refresh ----------------
+    def refresh_expiring(self, lead: float = TOKEN_REFRESH_LEAD):
+        for user_id, user in self.store.load_all().items():
+            if not user.get("refresh_token") or not needs_refresh(user, lead):
+                continue
+            try:
+                self.ensure_fresh(user_id, margin=lead)
+            except Exception as e:
+                logger.warning(f"Background token refresh failed for {user.get('username', user_id)}: {e}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_expiring()
+            except Exception as e:
+                logger.warning(f"Background token refresh pass failed: {e}")
+            self._stop.wait(TOKEN_REFRESH_INTERVAL)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="token-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
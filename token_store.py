@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator
+
+logger = logging.getLogger("token_store")
+
+TOKEN_DB = os.getenv("TOKEN_DB", "users.db")
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")  # sqlite | memory
+
+
+class TokenStore(ABC):
+    """
+    Storage for per-account OAuth tokens: user_id -> {"username", "access_token",
+    "refresh_token", "expires_in", "obtained_at"}.
+    """
+
+    @abstractmethod
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def put(self, user_id: str, user: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def update(self, user_id: str, fn: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Atomic read-modify-write of one user: fn(current) -> new (None = no change).
+        Returns the stored value afterwards.
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, user_id: str):
+        ...
+
+    @abstractmethod
+    def version(self) -> int:
+        """
+        Counter that changes whenever any process writes to the store. Used by
+        UsersView to notice changes made by other workers.
+        """
+        ...
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    In-process backend with the same semantics as SqliteTokenStore (a local
+    stand-in for a networked store such as Redis). Only shared between threads.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._version = 0
+        self._lock = threading.RLock()
+
+    def load_all(self):
+        with self._lock:
+            return {k: dict(v) for k, v in self._users.items()}
+
+    def get(self, user_id):
+        with self._lock:
+            user = self._users.get(user_id)
+            return dict(user) if user is not None else None
+
+    def put(self, user_id, user):
+        with self._lock:
+            self._users[user_id] = dict(user)
+            self._version += 1
+
+    def update(self, user_id, fn):
+        with self._lock:
+            new = fn(self.get(user_id))
+            if new is None:
+                return self.get(user_id)
+            self.put(user_id, new)
+            return dict(new)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._version += 1
+
+    def version(self):
+        return self._version
+
+
+class SqliteTokenStore(TokenStore):
+    """
+    One row per account in a WAL-mode SQLite file.
+
+    Writes touch a single row. update() runs inside BEGIN IMMEDIATE, which takes
+    SQLite's write lock, so read-modify-write is serialised across threads and
+    processes (e.g. several gunicorn workers).
+    """
+
+    def __init__(self, path: str = TOKEN_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit mode; transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        rows = self._conn().execute("SELECT user_id, data FROM users ORDER BY rowid").fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, user_id: str, user: Dict[str, Any]):
+        conn.execute(
+            "INSERT INTO users (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, json.dumps(user, ensure_ascii=False), time.time()),
+        )
+        self._bump_version(conn)
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def put(self, user_id: str, user: Dict[str, Any]):
+        with self._transaction() as conn:
+            self._write(conn, user_id, user)
+
+    def update(self, user_id, fn):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            current = json.loads(row[0]) if row else None
+            new = fn(current)
+            if new is None:
+                return current
+            self._write(conn, user_id, new)
+            return new
+
+    def delete(self, user_id: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+            self._bump_version(conn)
+
+    def version(self):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+
+def create_token_store(backend: str = STATE_BACKEND, path: str = TOKEN_DB) -> TokenStore:
+    if backend == "sqlite":
+        return SqliteTokenStore(path)
+    if backend == "memory":
+        return MemoryTokenStore()
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
+
+
+# =========================================================
+# Shared USERS view
+# =========================================================
+class UsersView(MutableMapping):
+    """
+    dict-like view of all accounts in a TokenStore.
+
+    Reads are served from a local snapshot that is reloaded whenever
+    store.version() changes, so an account added or refreshed by another
+    worker process is visible on the next access. Assignments and deletions
+    write straight through to the store.
+    """
+
+    def __init__(self, store: TokenStore):
+        self.store = store
+        self._snapshot: Dict[str, Dict[str, Any]] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> Dict[str, Dict[str, Any]]:
+        version = self.store.version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._snapshot = self.store.load_all()
+                    self._version = version
+        return self._snapshot
+
+    def __getitem__(self, user_id):
+        return self._current()[user_id]
+
+    def __setitem__(self, user_id, user):
+        self.store.put(user_id, user)
+
+    def __delitem__(self, user_id):
+        if user_id not in self._current():
+            raise KeyError(user_id)
+        self.store.delete(user_id)
+
+    def __iter__(self):
+        return iter(self._current())
+
+    def __len__(self):
+        return len(self._current())
+
+
+# =========================================================
+# users.json migration
+# =========================================================
+def migrate_json(json_path: str, store: TokenStore) -> int:
+    """
+    One-time import of the legacy users.json into `store`. Accounts already in
+    the store are left untouched. The JSON file is renamed to *.migrated
+    afterwards so the import does not run again. Returns the number imported.
+    """
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except FileNotFoundError:
+        return 0  # nothing to migrate, or another worker already did it
+
+    imported = 0
+    for user_id, user in legacy.items():
+        # update() may return a copy (MemoryTokenStore), so note whether fn saw an empty slot
+        missing = []
+
+        def insert_if_missing(current, user=user, missing=missing):
+            missing[:] = [current is None]
+            return user if current is None else None
+
+        store.update(user_id, insert_if_missing)
+        if missing and missing[0]:
+            imported += 1
+
+    try:
+        os.replace(json_path, json_path + ".migrated")
+    except FileNotFoundError:
+        pass
+    logger.info(f"Migrated {imported} account(s) from {json_path} to token store")
+    return imported
@@ -0,0 +1,21 @@
+"""
+Production entry point (multi-process):
+
+    gunicorn -w 4 --threads 8 -b 0.0.0.0:8000 wsgi:app
+
+APP_MODE=production keeps job state in STATE_DB so any worker can serve a poll.
+Accounts/tokens are always read from the shared token store (TOKEN_DB).
+
+Importing app starts the post queue scheduler (POST_QUEUE_AUTOSTART) and the
+background token refresher (TOKEN_REFRESH_BACKGROUND) in every worker. Both
+coordinate through their SQLite files (one post in flight per account, one
+refresh per account, see post_queue.py / token_refresh.py), but every worker
+still runs its own threads and polls the DB.
+"""
+import os
+
+os.environ.setdefault("APP_MODE", "production")
+
+from app import app  # noqa: E402
+
+__all__ = ["app"]